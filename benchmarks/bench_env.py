@@ -0,0 +1,174 @@
+"""End-to-end throughput benchmarks for DeepmindLabEnv.
+
+By default the environments run on the in-process fake Lab backend, so the
+numbers measure the overhead of gym_deepmindlab itself. Pass --backend
+deepmind_lab to benchmark against a real DeepMind Lab build.
+
+    python benchmarks/bench_env.py
+    python benchmarks/bench_env.py --scene memory_task_zero --steps 20000
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from gym_deepmindlab.env import DeepmindLabEnv
+
+
+def percentiles(latencies):
+    return np.percentile(np.asarray(latencies) * 1e6, [50, 90, 99])
+
+
+def time_calls(fn, count):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(count):
+        t = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t)
+    return count / (time.perf_counter() - start), latencies
+
+
+def peak_allocations(fn, count):
+    # Largest amount of memory a single call had allocated at once, on average.
+    tracemalloc.start()
+    peaks = []
+    try:
+        for i in range(count):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn(i)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return float(np.mean(peaks))
+
+
+def report(name, rate, latencies, allocated):
+    p50, p90, p99 = percentiles(latencies)
+    print('%-28s %12.1f %10.1f %10.1f %10.1f %12.1f' % (name, rate, p50, p90, p99, allocated / 1024.0))
+
+
+def bench_step(args, name, report_format=None, live_stats=False):
+    env = DeepmindLabEnv(args.scene, backend=args.backend, frame_skip=args.frame_skip)
+    report_path = None
+    try:
+        if report_format is not None:
+            report_path = tempfile.mkdtemp(prefix='bench_env_')
+            env.set_report_path(report_path, 0, report_format=report_format, live_stats=live_stats)
+        env.reset()
+        n = env.action_space.n
+
+        def step(i):
+            env.step(i % n)
+
+        step_count = args.steps
+        time_calls(step, min(1000, step_count))
+        rate, latencies = time_calls(step, step_count)
+        allocated = peak_allocations(step, min(2000, step_count))
+        report(name, rate, latencies, allocated)
+    finally:
+        env.close()
+        if report_path is not None:
+            shutil.rmtree(report_path)
+
+
+def bench_reset(args):
+    env = DeepmindLabEnv(args.scene, backend=args.backend)
+    try:
+        def reset(i):
+            env.reset()
+
+        reset(0)
+        rate, latencies = time_calls(reset, args.resets)
+        allocated = peak_allocations(reset, min(50, args.resets))
+        report('reset', rate, latencies, allocated)
+    finally:
+        env.close()
+
+
+def bench_vector(args):
+    from gym_deepmindlab.vector import DeepmindLabVectorEnv
+    env = DeepmindLabVectorEnv(args.scene, num_envs=args.num_envs, backend=args.backend, frame_skip=args.frame_skip)
+    try:
+        env.reset()
+        actions = np.zeros(args.num_envs, dtype=np.int32)
+
+        def step(i):
+            actions[:] = i % env.single_action_space.n
+            env.step(actions)
+
+        step_count = args.steps // args.num_envs
+        time_calls(step, min(100, step_count))
+        rate, latencies = time_calls(step, step_count)
+        allocated = peak_allocations(step, min(500, step_count))
+        report('vector step x%d (env steps)' % args.num_envs, rate * args.num_envs, latencies, allocated)
+    finally:
+        env.close()
+
+
+def bench_server(args):
+    from gym_deepmindlab.server import DeepmindLabRemoteVectorEnv
+    temp_dir = tempfile.mkdtemp()
+    socket_path = os.path.join(temp_dir, 'server.sock')
+    server = subprocess.Popen([sys.executable, '-m', 'gym_deepmindlab.server', '--socket', socket_path,
+                               '--max-envs', str(args.num_envs), '--backend', args.backend],
+                              stdout=subprocess.DEVNULL)
+    env = None
+    try:
+        while not os.path.exists(socket_path):
+            time.sleep(0.01)
+        env = DeepmindLabRemoteVectorEnv(args.scene, num_envs=args.num_envs, socket_path=socket_path,
+                                         frame_skip=args.frame_skip)
+        env.reset()
+        actions = np.zeros(args.num_envs, dtype=np.int32)
+
+        def step(i):
+            actions[:] = i % env.single_action_space.n
+            env.step(actions)
+
+        step_count = args.steps // args.num_envs
+        time_calls(step, min(100, step_count))
+        rate, latencies = time_calls(step, step_count)
+        allocated = peak_allocations(step, min(500, step_count))
+        report('server step x%d (env steps)' % args.num_envs, rate * args.num_envs, latencies, allocated)
+    finally:
+        if env is not None:
+            env.close()
+        server.terminate()
+        server.wait()
+        shutil.rmtree(temp_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scene', default='sound_task_zero')
+    parser.add_argument('--backend', default='fake')
+    parser.add_argument('--steps', type=int, default=10000)
+    parser.add_argument('--resets', type=int, default=200)
+    parser.add_argument('--frame-skip', type=int, default=1)
+    parser.add_argument('--num-envs', type=int, default=4)
+    parser.add_argument('--skip-vector', action='store_true')
+    parser.add_argument('--skip-server', action='store_true')
+    args = parser.parse_args()
+
+    print('%-28s %12s %10s %10s %10s %12s' % ('case', 'steps/s', 'p50 us', 'p90 us', 'p99 us', 'peak KiB'))
+    bench_step(args, 'step')
+    bench_step(args, 'step + csv report', report_format='csv')
+    bench_step(args, 'step + eventlog report', report_format='eventlog')
+    bench_step(args, 'step + csv + live stats', report_format='csv', live_stats=True)
+    bench_reset(args)
+    if not args.skip_vector:
+        bench_vector(args)
+    if not args.skip_server:
+        bench_server(args)
+
+
+if __name__ == '__main__':
+    main()
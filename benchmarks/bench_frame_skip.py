@@ -0,0 +1,40 @@
+"""Measure DeepmindLabEnv steps per second for different frame_skip values.
+
+Run with the package and DeepMind Lab installed:
+
+    python benchmarks/bench_frame_skip.py --scene sound_task_zero
+"""
+import argparse
+import time
+
+from gym_deepmindlab.env import DeepmindLabEnv
+
+
+def run(scene, frame_skip, steps, **kwargs):
+    env = DeepmindLabEnv(scene, frame_skip=frame_skip, **kwargs)
+    try:
+        env.reset()
+        start = time.perf_counter()
+        for step in range(steps):
+            env.step(step % env.action_space.n)
+        return steps / (time.perf_counter() - start)
+    finally:
+        env.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scene', default='sound_task_zero')
+    parser.add_argument('--backend', default=None, help="'deepmind_lab' (default) or 'fake'")
+    parser.add_argument('--steps', type=int, default=2000)
+    parser.add_argument('--frame-skip', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    print('%-10s %12s %12s' % ('frame_skip', 'steps/s', 'frames/s'))
+    for frame_skip in args.frame_skip:
+        steps_per_second = run(args.scene, frame_skip, args.steps, backend=args.backend)
+        print('%-10d %12.1f %12.1f' % (frame_skip, steps_per_second, steps_per_second * frame_skip))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Measure how long `import gym_deepmindlab` takes in a fresh interpreter.
+
+The import must only register the environment ids: it fails if it loads
+deepmind_lab, atari_py or the environment modules, or if the median import
+time is above --max-ms.
+
+    python benchmarks/bench_import.py --max-ms 500
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ('deepmind_lab', 'atari_py', 'gym_deepmindlab.env', 'gym_deepmindlab.vector')
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import gym_deepmindlab
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "modules": sorted(m for m in %r if m in sys.modules)}))
+''' % (HEAVY_MODULES,)
+
+
+def measure():
+    output = subprocess.check_output([sys.executable, '-W', 'ignore', '-c', PROBE], stderr=subprocess.DEVNULL)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def self_time(module):
+    """Time spent importing `module` itself, excluding its dependencies, from -X importtime."""
+    output = subprocess.run([sys.executable, '-W', 'ignore', '-X', 'importtime', '-c', 'import ' + module],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE).stderr.decode()
+    for line in output.splitlines():
+        parts = [part.strip() for part in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[0].split()[-1]) / 1000.0
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--max-ms', type=float, default=None, help='fail if the median import time is above this')
+    args = parser.parse_args()
+
+    results = [measure() for _ in range(args.repeat)]
+    times = sorted(result['seconds'] * 1000 for result in results)
+    median = times[len(times) // 2]
+    print('import gym_deepmindlab: median %.1f ms, min %.1f ms, max %.1f ms' % (median, times[0], times[-1]))
+    own = self_time('gym_deepmindlab')
+    if own is not None:
+        print('gym_deepmindlab self time (excluding dependencies): %.2f ms' % own)
+
+    failed = False
+    loaded = results[0]['modules']
+    if loaded:
+        print('FAIL: importing gym_deepmindlab loaded %s' % ', '.join(loaded))
+        failed = True
+    if args.max_ms is not None and median > args.max_ms:
+        print('FAIL: median import time %.1f ms is above %.1f ms' % (median, args.max_ms))
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
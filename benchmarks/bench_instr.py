@@ -0,0 +1,76 @@
+"""Compare the shared INSTR decoder against parsing the stream twice per step.
+
+Run with the package installed (`pip install -e .`):
+
+    python benchmarks/bench_instr.py
+"""
+import argparse
+import json
+import timeit
+
+from gym_deepmindlab.instr import parse_instr, episode_finished, POSITION, INDICATION_STATUS
+
+
+def make_instr(n_commands):
+    commands = {'nCommands': n_commands}
+    for idx in range(1, n_commands + 1):
+        if idx % 2:
+            opt = {'Num1': 3, 'Num2': 125.0 + idx, 'String1': 'corridor'}
+            command = POSITION
+        else:
+            opt = {'Num1': 3, 'Num2': 125.0 + idx, 'String1': 'sound_on'}
+            command = INDICATION_STATUS
+        commands['Command' + str(idx)] = {'Command': command, 'Opt': opt}
+    return json.dumps(commands)
+
+
+def legacy_step(instr):
+    # done()
+    done = False
+    if instr:
+        parsed = json.loads(instr)
+        for command_idx in range(1, parsed['nCommands'] + 1):
+            if parsed['Command' + str(command_idx)]['Command'] == "EpisodeFinished":
+                done = True
+                break
+    # process_command()
+    if instr:
+        parsed = json.loads(instr)
+        for command_idx in range(1, parsed['nCommands'] + 1):
+            command = parsed['Command' + str(command_idx)]['Command']
+            if command == "Position":
+                parsed['Command' + str(command_idx)]['Opt']['Num1']
+                parsed['Command' + str(command_idx)]['Opt']['Num2']
+                parsed['Command' + str(command_idx)]['Opt']['String1']
+            elif command == "IndicationStatus":
+                parsed['Command' + str(command_idx)]['Opt']['Num1']
+                parsed['Command' + str(command_idx)]['Opt']['Num2']
+                parsed['Command' + str(command_idx)]['Opt']['String1']
+    return done
+
+
+def shared_step(instr):
+    events = parse_instr(instr)
+    done = episode_finished(events)
+    for event in events:
+        if event.command == POSITION:
+            event.num1, event.num2, event.string1
+        elif event.command == INDICATION_STATUS:
+            event.num1, event.num2, event.string1
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for name, instr in [('empty', ''), ('1 command', make_instr(1)), ('4 commands', make_instr(4))]:
+        for label, fn in [('double parse', legacy_step), ('shared parse', shared_step)]:
+            best = min(timeit.repeat(lambda: fn(instr), number=args.number, repeat=args.repeat))
+            print('%-12s %-14s %8.3f us/step' % (name, label, best / args.number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -20,3 +20,23 @@ for key, l in MAP.items():
         entry_point='gym_deepmindlab.env:DeepmindLabEnv',
         kwargs=dict(scene=l)
     )
+    register(
+        id='DeepmindLab%sVector-v0' % key,
+        entry_point='gym_deepmindlab.vector:DeepmindLabVectorEnv',
+        kwargs=dict(scene=l)
+    )
+
+# Importing the package only registers the environment ids. The modules with
+# the environments, and deepmind_lab itself, are loaded on first use.
+_LAZY = {
+    'DeepmindLabEnv': 'gym_deepmindlab.env',
+    'DeepmindLabVectorEnv': 'gym_deepmindlab.vector',
+    'DeepmindLabMultiLevelEnv': 'gym_deepmindlab.multilevel',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        return getattr(importlib.import_module(_LAZY[name]), name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -0,0 +1,73 @@
+import asyncio
+import concurrent.futures
+
+import gym
+
+
+class AsyncDeepmindLabEnv(gym.Wrapper):
+    """Runs step() and reset() of a DeepmindLabEnv on a dedicated worker thread.
+
+    step_async(action) returns immediately and step_wait() returns what step()
+    would have returned, so the caller can compute the actions of other
+    environments while this one renders; Lab releases the GIL while it runs.
+    astep() and areset() are the asyncio equivalents. step() keeps its usual
+    blocking contract, including the automatic reset.
+
+    The observation is a view of the environment's frame buffer unless the
+    environment was created with copy_obs=True, so it is only valid until the
+    next step_async().
+    """
+
+    def __init__(self, env):
+        super(AsyncDeepmindLabEnv, self).__init__(env)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1,
+                                                               thread_name_prefix='AsyncDeepmindLabEnv')
+        self._pending = None
+
+    def step_async(self, action):
+        if self._pending is not None:
+            raise Exception('step_async() called again before step_wait()')
+        self._pending = self._executor.submit(self.env.step, action)
+
+    def step_wait(self, timeout=None):
+        if self._pending is None:
+            raise Exception('step_wait() called without step_async()')
+        pending = self._pending
+        try:
+            return pending.result(timeout)
+        finally:
+            # After a timeout the step is still running and step_wait() can be
+            # called again; once it finished, also with an error, it is done.
+            if pending.done():
+                self._pending = None
+
+    def step(self, action):
+        self.step_async(action)
+        return self.step_wait()
+
+    def reset(self, **kwargs):
+        self._wait_pending()
+        return self._executor.submit(self.env.reset, **kwargs).result()
+
+    async def astep(self, action):
+        self.step_async(action)
+        pending = self._pending
+        try:
+            return await asyncio.wrap_future(pending)
+        finally:
+            if self._pending is pending:
+                self._pending = None
+
+    async def areset(self, **kwargs):
+        self._wait_pending()
+        return await asyncio.wrap_future(self._executor.submit(self.env.reset, **kwargs))
+
+    def _wait_pending(self):
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            concurrent.futures.wait([pending])
+
+    def close(self):
+        self._wait_pending()
+        self._executor.shutdown(wait=True)
+        return self.env.close()
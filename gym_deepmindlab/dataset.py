@@ -0,0 +1,305 @@
+import json
+import os
+
+import gym
+import numpy as np
+
+from .instr import COMMANDS
+
+STEP_DTYPE = np.dtype([('action', '<i2'), ('reward', '<f4'), ('done', '?')])
+EVENT_DTYPE = np.dtype([('step', '<i8'), ('command', 'u1'), ('num1', '<f8'), ('num2', '<f8'),
+                        ('string1', 'S32'), ('string2', 'S32')])
+COMMAND_CODES = {command: code for code, command in enumerate(COMMANDS)}
+
+META = 'meta.json'
+EPISODES = 'episodes.npy'
+# The observation after the last transition of every episode, in the order
+# of episodes.npy, as raw uint8 frames.
+FINAL_OBS = 'final_obs.bin'
+
+
+def rank_path(path, rank):
+    return os.path.join(str(path), 'rat' + str(rank))
+
+
+def _chunk_name(path, chunk, kind):
+    return os.path.join(path, 'chunk%05d_%s.npy' % (chunk, kind))
+
+
+def _number(value):
+    return np.nan if value is None else value
+
+
+def _string(value):
+    return b'' if value is None else value.encode()[:32]
+
+
+class TrajectoryRecorder(gym.Wrapper):
+    """Streams the transitions of a DeepmindLabEnv into memory-mapped files.
+
+    Every row holds the observation the action was taken from, the action
+    (an index into ACTION_LIST), the reward and done. Rows are written into
+    preallocated chunks of chunk_size rows under path/rat{rank}/, together
+    with the decoded INSTR events of each step and an index of the episode
+    boundaries. Episodes end when step() returns done, at the automatic
+    reset of step() and at reset(). The observation that followed the last
+    transition of each episode is kept in final_obs.bin, as the next row
+    does not hold it when the Lab restarted. Use TrajectoryDataset to read
+    them.
+    """
+
+    def __init__(self, env, path, rank=0, chunk_size=10000):
+        super(TrajectoryRecorder, self).__init__(env)
+        self.path = rank_path(path, rank)
+        os.makedirs(self.path, exist_ok=True)
+        self.chunk_size = chunk_size
+        self._obs_shape = tuple(env.observation_space.shape)
+        if os.path.exists(os.path.join(self.path, META)):
+            raise Exception('%s already contains a recording' % self.path)
+
+        self._chunk_counts = []
+        self._episodes = []
+        self._episode_start = 0
+        self._has_obs = False
+        self._closed = False
+        self._final_obs = open(os.path.join(self.path, FINAL_OBS), 'wb')
+        self._open_chunk()
+
+    @property
+    def size(self):
+        return sum(self._chunk_counts) + self._count
+
+    def _open_chunk(self):
+        chunk = len(self._chunk_counts)
+        self._obs = np.lib.format.open_memmap(_chunk_name(self.path, chunk, 'obs'), mode='w+', dtype=np.uint8,
+                                              shape=(self.chunk_size,) + self._obs_shape)
+        self._steps = np.lib.format.open_memmap(_chunk_name(self.path, chunk, 'steps'), mode='w+',
+                                                dtype=STEP_DTYPE, shape=(self.chunk_size,))
+        self._events = []
+        self._count = 0
+
+    def _close_chunk(self):
+        chunk = len(self._chunk_counts)
+        self._obs.flush()
+        self._steps.flush()
+        np.save(_chunk_name(self.path, chunk, 'events'), np.array(self._events, dtype=EVENT_DTYPE))
+        self._chunk_counts.append(self._count)
+        self._obs = self._steps = None
+        self._write_index()
+
+    def _write_index(self):
+        # The final observations are flushed first, so that every indexed
+        # episode has one.
+        self._final_obs.flush()
+        np.save(os.path.join(self.path, EPISODES), np.array(self._episodes, dtype=np.int64).reshape(-1, 2))
+        meta = {'chunk_size': self.chunk_size, 'obs_shape': self._obs_shape, 'chunks': self._chunk_counts}
+        temp_name = os.path.join(self.path, META + '.tmp')
+        with open(temp_name, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temp_name, os.path.join(self.path, META))
+
+    def _end_episode(self, final_obs=None):
+        """Ends the episode; final_obs defaults to the observation after the last transition."""
+        end = self.size
+        if end > self._episode_start:
+            self._episodes.append((self._episode_start, end))
+            if final_obs is None:
+                final_obs = self._obs[self._count]
+            self._final_obs.write(np.ascontiguousarray(final_obs, dtype=np.uint8).tobytes())
+        self._episode_start = end
+
+    def _set_obs(self, obs):
+        if self._count == self.chunk_size:
+            self._close_chunk()
+            self._open_chunk()
+        self._obs[self._count] = obs
+        self._has_obs = True
+
+    def reset(self, **kwargs):
+        self._end_episode()
+        obs = self.env.reset(**kwargs)
+        self._set_obs(obs)
+        return obs
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+        if 'episode' in info and not done:
+            # step() restarted the Lab episode without applying the action.
+            self._end_episode()
+        elif self._has_obs:
+            step = self.size
+            self._steps[self._count] = (action, reward, done)
+            for event in getattr(self.env.unwrapped, 'last_events', ()):
+                self._events.append((step, COMMAND_CODES.get(event.command, 255), _number(event.num1),
+                                     _number(event.num2), _string(event.string1), _string(event.string2)))
+            self._count += 1
+            if done:
+                self._end_episode(obs)
+        self._set_obs(obs)
+        return obs, reward, done, info
+
+    def close(self):
+        if not self._closed:
+            self._end_episode()
+            self._close_chunk()
+            self._final_obs.close()
+            self._closed = True
+        return self.env.close()
+
+
+class TrajectoryDataset:
+    """Random access to recordings written by TrajectoryRecorder.
+
+    path is either one rat{rank} directory or a directory containing several.
+    Chunks are memory-mapped on first use, so only the sampled frames are read.
+    Only the transitions of indexed episodes are sampled; a recording that
+    was not closed can end with transitions of an unfinished episode.
+    """
+
+    def __init__(self, path):
+        if os.path.exists(os.path.join(path, META)):
+            paths = [path]
+        else:
+            paths = sorted(os.path.join(path, name) for name in os.listdir(path)
+                           if os.path.exists(os.path.join(path, name, META)))
+        if not paths:
+            raise Exception('No recordings found in %s' % path)
+
+        self._chunks = []
+        self._final_obs = []
+        episode_starts = []
+        episode_ends = []
+        offset = 0
+        for rank_dir in paths:
+            with open(os.path.join(rank_dir, META)) as f:
+                meta = json.load(f)
+            rank_offset = offset
+            for chunk, count in enumerate(meta['chunks']):
+                if count:
+                    self._chunks.append((rank_dir, chunk, offset, count, rank_offset))
+                    offset += count
+            episodes = np.load(os.path.join(rank_dir, EPISODES)) + rank_offset
+            episode_starts.append(episodes[:, 0])
+            episode_ends.append(episodes[:, 1])
+            if len(episodes):
+                self._final_obs.append(np.memmap(os.path.join(rank_dir, FINAL_OBS), dtype=np.uint8, mode='r',
+                                                 shape=(len(episodes),) + tuple(meta['obs_shape'])))
+        self._size = offset
+        self._chunk_offsets = np.array([chunk[2] for chunk in self._chunks], dtype=np.int64)
+        self.episode_starts = np.concatenate(episode_starts)
+        self.episode_ends = np.concatenate(episode_ends)
+        self._episode_lengths = np.cumsum(self.episode_ends - self.episode_starts)
+        self._maps = {}
+
+    def __len__(self):
+        return self._size
+
+    def _chunk(self, index):
+        if index not in self._maps:
+            rank_dir, chunk, _, count, _ = self._chunks[index]
+            self._maps[index] = (np.load(_chunk_name(rank_dir, chunk, 'obs'), mmap_mode='r')[:count],
+                                 np.load(_chunk_name(rank_dir, chunk, 'steps'), mmap_mode='r')[:count])
+        return self._maps[index]
+
+    def _locate(self, indices):
+        chunks = np.searchsorted(self._chunk_offsets, indices, side='right') - 1
+        return chunks, indices - self._chunk_offsets[chunks]
+
+    def episode(self, indices):
+        """Returns the index of the episode of every transition in indices."""
+        indices = np.asarray(indices, dtype=np.int64)
+        episodes = np.searchsorted(self.episode_starts, indices, side='right') - 1
+        if len(self.episode_ends):
+            outside = (episodes < 0) | (indices >= self.episode_ends[np.maximum(episodes, 0)])
+        else:
+            outside = np.ones(indices.shape, dtype=bool)
+        if np.any(outside):
+            raise IndexError('Transitions %s are not part of a recorded episode' % indices[outside].tolist())
+        return episodes
+
+    def episode_start(self, indices):
+        return self.episode_starts[self.episode(indices)]
+
+    def final_frames(self, episodes):
+        """Returns the observation that followed the last transition of every episode."""
+        episodes = np.asarray(episodes, dtype=np.int64)
+        out = None
+        offset = 0
+        for final_obs in self._final_obs:
+            selected = np.flatnonzero((episodes >= offset) & (episodes < offset + len(final_obs)))
+            if len(selected):
+                if out is None:
+                    out = np.empty(episodes.shape + final_obs.shape[1:], dtype=np.uint8)
+                out[selected] = final_obs[episodes[selected] - offset]
+            offset += len(final_obs)
+        return out
+
+    def frames(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        out = None
+        chunks, offsets = self._locate(indices.ravel())
+        for chunk in np.unique(chunks):
+            selected = np.flatnonzero(chunks == chunk)
+            obs, _ = self._chunk(int(chunk))
+            frames = obs[np.sort(offsets[selected])]
+            if out is None:
+                out = np.empty((indices.size,) + obs.shape[1:], dtype=np.uint8)
+            out[selected[np.argsort(offsets[selected], kind='stable')]] = frames
+        return out.reshape(indices.shape + out.shape[1:])
+
+    def transitions(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        steps = np.empty(indices.shape, dtype=STEP_DTYPE)
+        chunks, offsets = self._locate(indices)
+        for chunk in np.unique(chunks):
+            selected = chunks == chunk
+            steps[selected] = self._chunk(int(chunk))[1][offsets[selected]]
+        return steps
+
+    def sample(self, batch_size, frame_stack=1, rng=None):
+        """Samples transitions uniformly; frame stacks repeat the first frame of the episode.
+
+        rng is a np.random.Generator or RandomState, np.random by default.
+        """
+        if not len(self._episode_lengths):
+            raise Exception('The recording has no complete episode to sample from')
+        rng = np.random if rng is None else rng
+        integers = rng.integers if hasattr(rng, 'integers') else rng.randint
+        positions = integers(0, self._episode_lengths[-1], size=batch_size)
+        # Positions count the transitions of the episodes one after another.
+        episodes = np.searchsorted(self._episode_lengths, positions, side='right')
+        lengths_before = self._episode_lengths[episodes] - (self.episode_ends - self.episode_starts)[episodes]
+        return self.get(self.episode_starts[episodes] + positions - lengths_before, frame_stack)
+
+    def get(self, indices, frame_stack=1):
+        """Returns the transitions at indices with frame stacks of the observation and of the next observation."""
+        indices = np.asarray(indices, dtype=np.int64)
+        episodes = self.episode(indices)
+        starts = self.episode_starts[episodes][:, None]
+        ends = self.episode_ends[episodes][:, None]
+        offsets = np.arange(1 - frame_stack, 1)[None, :]
+        stack = np.maximum(indices[:, None] + offsets, starts)
+        next_stack = np.maximum(indices[:, None] + 1 + offsets, starts)
+        # The observation after the last transition of an episode is not a row of it.
+        last = next_stack == ends
+        next_obs = self.frames(np.minimum(next_stack, ends - 1))
+        if np.any(last):
+            next_obs[last] = self.final_frames(np.broadcast_to(episodes[:, None], last.shape)[last])
+        steps = self.transitions(indices)
+        return {'obs': self.frames(stack),
+                'action': steps['action'],
+                'reward': steps['reward'],
+                'done': steps['done'],
+                'next_obs': next_obs,
+                'index': indices}
+
+    def events(self, start, end):
+        """Returns the INSTR events recorded for the transitions in [start, end)."""
+        result = []
+        for rank_dir, chunk, offset, count, rank_offset in self._chunks:
+            if offset + count <= start or offset >= end:
+                continue
+            events = np.load(_chunk_name(rank_dir, chunk, 'events'))
+            events['step'] += rank_offset
+            result.append(events[(events['step'] >= start) & (events['step'] < end)])
+        return np.concatenate(result) if result else np.zeros(0, dtype=EVENT_DTYPE)
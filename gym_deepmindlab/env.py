@@ -1,392 +1,411 @@
 import gym
-from gym import error, spaces, utils
 from gym.utils import seeding
 import numpy as np
-import deepmind_lab
-from . import LEVELS, MAP
+from . import LEVELS
+from .writer import CsvReportWriter
+from .level_cache import LevelCache
+from .profiling import PhaseTimer, histogram_bounds, LAB_STEP, OBSERVATIONS, INSTR_PARSE, PROCESS_COMMAND, \
+    REPORT_WRITE, RESET
+from .instr import parse_instr, episode_finished, NO_EVENTS
+from .tasks import make_task, task_family
+from .replay import InstrRecorder
+import concurrent.futures
 import time
-import datetime
-import json
-import csv
 import os
 
-try:
-    import atari_py
-except ImportError as e:
-    raise error.DependencyNotInstalled(
-        "{}. (HINT: you can install Atari dependencies by running "
-        "'pip install gym[atari]'.)".format(e))
 
+def lab_backend(backend=None):
+    """Returns the class used in place of deepmind_lab.Lab.
 
-def time_in_seconds(time):
-    return (int(time) % 3600) % 60
+    backend is 'deepmind_lab', 'fake' or a callable with the signature of
+    deepmind_lab.Lab. It defaults to the GYM_DEEPMINDLAB_BACKEND environment
+    variable, and to 'deepmind_lab' when that is not set.
+    """
+    if backend is None:
+        backend = os.environ.get('GYM_DEEPMINDLAB_BACKEND', 'deepmind_lab')
+    if backend == 'deepmind_lab':
+        import deepmind_lab
+        return deepmind_lab.Lab
+    elif backend == 'fake':
+        from .fake_lab import FakeLab
+        return FakeLab
+    elif callable(backend):
+        return backend
+    raise Exception('Backend %s not supported' % (backend))
 
 
 class DeepmindLabEnv(gym.Env):
     metadata = {'render.modes': ['rgb_array']}
 
-    def __init__(self, scene, colors='RGB_INTERLEAVED', width=84, height=84, **kwargs):
+    def __init__(self, scene, colors='RGB_INTERLEAVED', width=84, height=84, fps=60, frame_skip=1,
+                 instr=None, copy_obs=False, obs_buffer=None, backend=None,
+                 instrument=False, stats_in_episode_info=False, level_cache_dir=None, level_cache_size=None,
+                 prereset=False, **kwargs):
         super(DeepmindLabEnv, self).__init__(**kwargs)
 
         if not scene in LEVELS:
             raise Exception('Scene %s not supported' % (scene))
+        if frame_skip < 1:
+            raise Exception('frame_skip must be at least 1, got %s' % (frame_skip))
 
         self._colors = colors
-        self._lab = deepmind_lab.Lab(scene, [self._colors, 'INSTR'],
-                                     dict(fps=str(60), width=str(width), height=str(height)))
+        # Each step repeats the action for frame_skip frames and returns the
+        # summed reward. A level script may replace its INSTR commands every
+        # frame instead of keeping them until the observation is read, so when
+        # INSTR is requested step() reads it after every frame, see
+        # _step_frames(); done() then sees every EpisodeFinished, with or
+        # without a report. Other levels step all frames in one Lab call.
+        self._frame_skip = frame_skip
+        # INSTR is only requested from the task levels, which need it for
+        # reporting and for detecting the end of an episode.
+        if instr is None:
+            instr = task_family(scene) is not None
+        self._instr = instr
+        observations = [self._colors, 'INSTR'] if self._instr else [self._colors]
+        # Compiled maps can be shared through a cache directory by all
+        # workers on the host; level_cache_size bounds it in bytes.
+        self.level_cache = None
+        lab_kwargs = {}
+        if level_cache_dir is not None:
+            self.level_cache = LevelCache(level_cache_dir, max_bytes=level_cache_size)
+            lab_kwargs['level_cache'] = self.level_cache
+        lab_class = lab_backend(backend)
+        lab_config = dict(fps=str(fps), width=str(width), height=str(height))
+        self._lab = lab_class(scene, observations, lab_config, **lab_kwargs)
+
+        # With prereset, a second Lab is reset in the background while the
+        # current episode runs and is swapped in by reset(), so episode
+        # boundaries cost about as much as a step. It doubles the memory used.
+        self._standby = None
+        self._standby_executor = None
+        self.prereset_ready = 0
+        self.prereset_waited = 0
+        self.prereset_wait_time = 0.0
+        if prereset:
+            self._standby_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1,
+                                                                           thread_name_prefix='DeepmindLabPrereset')
+            self._standby = self._standby_executor.submit(self._prepare_standby,
+                                                          lambda: lab_class(scene, observations, lab_config,
+                                                                            **lab_kwargs))
 
         self.action_space = gym.spaces.Discrete(len(ACTION_LIST))
         self.observation_space = gym.spaces.Box(0, 255, (height, width, 3), dtype=np.uint8)
 
-        self._last_observation = None
+        # Frames are copied into one preallocated buffer. Unless copy_obs is
+        # set, step() and reset() return a read-only view of it, which is
+        # overwritten by the next call.
+        if obs_buffer is None:
+            obs_buffer = np.zeros(self.observation_space.shape, dtype=np.uint8)
+        elif obs_buffer.shape != self.observation_space.shape or obs_buffer.dtype != np.uint8:
+            raise Exception('obs_buffer must be a uint8 array of shape %s' % (self.observation_space.shape,))
+        self._frame = obs_buffer
+        self._frame_view = obs_buffer.view()
+        self._frame_view.flags.writeable = False
+        self._copy_obs = copy_obs
         self.total_reward = 0.0
         self.len = 0
-        self.start = time.clock()
+        self.start = time.time()
         self.report_path = None
         self.report_rank = 0
-
-        self.sound_on = None
-        self.distractor_on = None
-        self.distractor_start_time = 0
-        self.distractor_stop_time = -5
-        self.rat_left_base_during_reward_time = False
-        self.rat_left_during_distractor = False
-        self.episode = 0
-        self.position = "base1"
-        self.missed_counter = 0
-        self.early_counter = 0
-        self.late_counter = 0
-        self.correct_counter = 0
-        self.distractor_counter = 0
-        self.correct_distractor_counter = 0
-
-        if "Sound" in scene or "sound" in scene:
-            self.write_to_file = self.write_to_file_sound
-            self.process_command = self.process_command_sound
-        elif "nose" in scene or "Nose" in scene:
-            self.write_to_file = self.write_to_file_nose_poke
-            self.process_command = self.process_command_nose_poke
-        elif "Memory" in scene or "memory" in scene:
-            self.process_command = self.process_command_memory
-            self.write_to_file = self.write_to_file_memory
-
-
-        # self.ale = atari_py.ALEInterface()
-
-    def set_report_path(self, path, rank):
+        self._report = None
+        self._instr_recorder = None
+        self._live_stats = None
+        self._lab_episode_started = False
+        # The decoded INSTR events of the last step.
+        self.last_events = NO_EVENTS
+        # Steps in which the Lab episode ended before INSTR could be read.
+        # The events of their last frame are lost.
+        self.truncated_steps = 0
+
+        # The INSTR events of the sound, nose poke and memory levels are scored
+        # by a Task, which also holds the counters written to the reports.
+        self.task = make_task(task_family(scene))
+        self.report_columns = self.task.columns
+
+        # Timing instrumentation is off unless requested; _timed() then only
+        # checks self._timer once per phase.
+        self._timer = None
+        self._stats_in_episode_info = stats_in_episode_info
+        if instrument or stats_in_episode_info:
+            self._enable_instrumentation()
+
+    def _enable_instrumentation(self):
+        if self._timer is not None:
+            return
+        self._timer = PhaseTimer()
+        write_to_file = self.task.write_to_file
+
+        def timed_write_to_file(type_event, seconds):
+            start = time.perf_counter()
+            write_to_file(type_event, seconds)
+            self._timer.record(REPORT_WRITE, time.perf_counter() - start)
+
+        self.task.write_to_file = timed_write_to_file
+
+    def add_profiler_hook(self, hook):
+        """Calls hook(phase, seconds) after every timed phase and enables instrumentation."""
+        self._enable_instrumentation()
+        self._timer.hooks.append(hook)
+
+    def remove_profiler_hook(self, hook):
+        """Stops calling hook; does nothing if it was not added."""
+        if self._timer is not None and hook in self._timer.hooks:
+            self._timer.hooks.remove(hook)
+
+    def get_stats(self):
+        """Returns the count, total and mean time in seconds and the latency histogram of every phase.
+
+        Histogram bucket i counts the calls faster than 2**i microseconds. The
+        process_command times include the report_write times.
+        """
+        if self._timer is None:
+            return {}
+        return {'phases': self._timer.stats(), 'histogram_bounds_us': histogram_bounds()}
+
+    def reset_stats(self):
+        if self._timer is not None:
+            self._timer.reset()
+
+    def _episode_info(self):
+        info = {'r': self.total_reward,
+                'l': self.len,
+                't': time.time() - self.start}
+        if self._stats_in_episode_info:
+            info['timings'] = self._timer.end_episode()
+        return info
+
+    def set_report_path(self, path, rank, queue_size=10000, on_full='block', report_format='csv',
+                        record_instr=False, live_stats=False):
         self.report_path = path
         self.report_rank = rank
         if not os.path.exists(self.report_path):
             os.mkdir(self.report_path)
-
-    def write_to_file_sound(self, type_event, seconds):
-        csv_name = str(self.report_path) + '/rat' + str(self.report_rank) + '_' + str(self.episode) + '.csv'
-        if not os.path.exists(csv_name):
-            with open(csv_name, 'w', newline='') as csvfile:
-                spamwriter = csv.writer(csvfile, delimiter=',',
-                                        quotechar='|', quoting=csv.QUOTE_MINIMAL)
-                spamwriter.writerow(['time_stamp', 'event', 'missed', 'early', 'late', 'distracted', 'dist.OK', 'correct'])
-        with open(csv_name, 'a') as fd:
-            writer = csv.writer(fd)
-            seconds = int(seconds)
-            h = str(seconds // 3600)
-            m = str((seconds % 3600) // 60)
-            s = str((seconds % 3600) % 60)
-            writer.writerow([str(self.episode) + "_" + h + ":" + m + ":" + s,
-                             type_event, self.missed_counter, self.early_counter, self.late_counter,
-                             self.distractor_counter, self.correct_distractor_counter, self.correct_counter])
-
-    def process_command_sound(self, obs):
-        if self.report_path is None:
-            return
-        instr = obs['INSTR']
-        if instr:
-            instr = json.loads(instr)
-            for command_idx in range(1, instr['nCommands'] + 1):
-                command = instr['Command' + str(command_idx)]['Command']
-                if command == "Position":
-                    self.episode = int(instr['Command' + str(command_idx)]['Opt']['Num1'])
-                    time = instr['Command' + str(command_idx)]['Opt']['Num2']
-                    new_position = instr['Command' + str(command_idx)]['Opt']['String1']
-
-                    if self.position == "base1" and new_position == "corridor":
-                        self.write_to_file("not_in_base", time)
-                        if self.sound_on:
-                            self.rat_left_base_during_reward_time = True
-                            self.write_to_file("rat_left_base_during_reward_time", time)
-                        elif self.distractor_on or \
-                                (self.distractor_stop_time - self.distractor_start_time < 5
-                                 and self.distractor_stop_time >= self.distractor_start_time):
-                            self.distractor_counter += 1
-                            self.rat_left_during_distractor = True
-                            self.write_to_file("rat_left_during_distractor", time)
-                            self.distractor_stop_time = (self.distractor_start_time + 5) % 60
-                        else:
-                            self.early_counter += 1
-                            self.write_to_file("left_early", time)
-                    if self.position == "corridor" and new_position == "base1":
-                        self.write_to_file("in_base", time)
-                    self.position = new_position
-
-                elif command == "Pickup":
-                    self.episode = int(instr['Command' + str(command_idx)]['Opt']['Num1'])
-                    time = instr['Command' + str(command_idx)]['Opt']['Num2']
-                    name = instr['Command' + str(command_idx)]['Opt']['String1']
-                    self.correct_counter += 1
-                    self.late_counter -= 1
-                    self.write_to_file("correct_trial", time)
-
-                elif command == "Timeout":
-                    time = instr['Command' + str(command_idx)]['Opt']['Num1']
-
-                elif command == "IndicationStatus":
-                    self.episode = instr['Command' + str(command_idx)]['Opt']['Num1']
-                    time = instr['Command' + str(command_idx)]['Opt']['Num2']
-                    status = instr['Command' + str(command_idx)]['Opt']['String1']
-                    if status == "sound_on":
-                        self.sound_on = True
-                        self.write_to_file("reward_time_started", time)
-                    elif status == "sound_off":
-                        self.sound_on = False
-                        if self.rat_left_base_during_reward_time:
-                            self.late_counter += 1
-                            self.rat_left_base_during_reward_time = False
-                            self.write_to_file("correct_or_late", time)
-                        elif self.position == "base1":  # and not self.rat_left_base_during_reward_time:
-                            self.missed_counter += 1
-                            self.write_to_file("missed_trial", time)
-
-                    elif status == "distractor_on":
-                        self.distractor_on = True
-                        self.rat_left_during_distractor = False
-                        self.distractor_start_time = time_in_seconds(time)
-                        self.write_to_file("distractor_time_started", time)
-                    elif status == "distractor_off":
-                        self.distractor_on = False
-                        self.distractor_stop_time = time_in_seconds(time)
-                        if not self.rat_left_during_distractor and self.distractor_stop_time - self.distractor_start_time >= 5:
-                            self.correct_distractor_counter += 1
-                            self.write_to_file("distractor_avoided", time)
-
-    def write_to_file_nose_poke(self, type_event, seconds):
-        csv_name = str(self.report_path) + '/rat' + str(self.report_rank) + '_' + str(self.episode) + '.csv'
-        if not os.path.exists(csv_name):
-            with open(csv_name, 'w', newline='') as csvfile:
-                spamwriter = csv.writer(csvfile, delimiter=',',
-                                        quotechar='|', quoting=csv.QUOTE_MINIMAL)
-                spamwriter.writerow(['time_stamp', 'event', 'missed', 'early', 'distracted', 'dist.OK', 'correct'])
-        with open(csv_name, 'a') as fd:
-            writer = csv.writer(fd)
-            seconds = int(seconds)
-            h = str(seconds // 3600)
-            m = str((seconds % 3600) // 60)
-            s = str((seconds % 3600) % 60)
-            writer.writerow([str(self.episode) + "_" + h + ":" + m + ":" + s,
-                             type_event, self.missed_counter, self.early_counter,
-                             self.distractor_counter, self.correct_distractor_counter, self.correct_counter])
-
-    def process_command_nose_poke(self, obs):
-        if self.report_path is None:
-            return
-        instr = obs['INSTR']
-        if instr:
-            instr = json.loads(instr)
-            for command_idx in range(1, instr['nCommands'] + 1):
-                command = instr['Command' + str(command_idx)]['Command']
-                if command == "Position":
-                    self.episode = int(instr['Command' + str(command_idx)]['Opt']['Num1'])
-                    time = instr['Command' + str(command_idx)]['Opt']['Num2']
-                    new_position = instr['Command' + str(command_idx)]['Opt']['String1']
-
-                    if self.position == "base1" and new_position == "nose_poke":
-                        self.write_to_file("not_in_base", time)
-                        if self.sound_on:
-                            self.rat_left_base_during_reward_time = True
-                            self.write_to_file("rat_left_base_during_reward_time", time)
-                        elif self.distractor_on:
-                            self.distractor_counter += 1
-                            self.rat_left_during_distractor = True
-                            self.write_to_file("rat_left_during_distractor", time)
-                        else:
-                            self.early_counter += 1
-                            self.write_to_file("left_early", time)
-                    if self.position == "nose_poke" and new_position == "base1":
-                        self.write_to_file("in_base", time)
-                    self.position = new_position
-
-                elif command == "Pickup":
-                    self.episode = int(instr['Command' + str(command_idx)]['Opt']['Num1'])
-                    time = instr['Command' + str(command_idx)]['Opt']['Num2']
-                    name = instr['Command' + str(command_idx)]['Opt']['String1']
-                    self.correct_counter += 1
-                    self.write_to_file("correct_trial", time)
-
-                elif command == "Timeout":
-                    time = instr['Command' + str(command_idx)]['Opt']['Num1']
-
-                elif command == "IndicationStatus":
-                    self.episode = instr['Command' + str(command_idx)]['Opt']['Num1']
-                    time = instr['Command' + str(command_idx)]['Opt']['Num2']
-                    status = instr['Command' + str(command_idx)]['Opt']['String1']
-                    if status == "sound_on":
-                        self.sound_on = True
-                        self.rat_left_base_during_reward_time = False
-                        self.reward_start_time = time_in_seconds(time)
-                        self.write_to_file("reward_time_started", time)
-                    elif status == "sound_off":
-                        self.sound_on = False
-                        self.reward_stop_time = time_in_seconds(time)
-                        if self.rat_left_base_during_reward_time:
-                            self.rat_left_base_during_reward_time = False
-                        elif self.reward_stop_time - self.reward_start_time >= 5:
-                            self.missed_counter += 1
-                            self.write_to_file("missed_trial", time)
-
-                    elif status == "distractor_on":
-                        self.distractor_on = True
-                        self.rat_left_during_distractor = False
-                        self.distractor_start_time = time_in_seconds(time)
-                        self.write_to_file("distractor_time_started", time)
-                    elif status == "distractor_off":
-                        self.distractor_on = False
-                        self.distractor_stop_time = time_in_seconds(time)
-                        if not self.rat_left_during_distractor and self.distractor_stop_time - self.distractor_start_time >= 5:
-                            self.correct_distractor_counter += 1
-                            self.write_to_file("distractor_avoided", time)
-
-    def write_to_file_memory(self, type_event, seconds):
-        csv_name = str(self.report_path) + '/rat' + str(self.report_rank) + '_' + str(self.episode) + '.csv'
-        if not os.path.exists(csv_name):
-            with open(csv_name, 'w', newline='') as csvfile:
-                spamwriter = csv.writer(csvfile, delimiter=',',
-                                        quotechar='|', quoting=csv.QUOTE_MINIMAL)
-                spamwriter.writerow(['time_stamp', 'event', 'missed', 'correct'])
-        with open(csv_name, 'a') as fd:
-            writer = csv.writer(fd)
-            seconds = int(seconds)
-            h = str(seconds // 3600)
-            m = str((seconds % 3600) // 60)
-            s = str((seconds % 3600) % 60)
-            writer.writerow([str(self.episode) + "_" + h + ":" + m + ":" + s,
-                             type_event, self.missed_counter, self.correct_counter])
-
-    def process_command_memory(self, obs):
-        if self.report_path is None:
-            return
-        instr = obs['INSTR']
-        if instr:
-            instr = json.loads(instr)
-            for command_idx in range(1, instr['nCommands'] + 1):
-                command = instr['Command' + str(command_idx)]['Command']
-
-                if command == "Position":
-                    self.episode = int(instr['Command' + str(command_idx)]['Opt']['Num1'])
-                    time = int(instr['Command' + str(command_idx)]['Opt']['Num2'])
-                    self.position = instr['Command' + str(command_idx)]['Opt']['String1']
-
-                    self.write_to_file(self.position, time)
-
-                elif command == "Pickup":
-                    self.episode = int(instr['Command' + str(command_idx)]['Opt']['Num1'])
-                    time = int(instr['Command' + str(command_idx)]['Opt']['Num2'])
-                    name = instr['Command' + str(command_idx)]['Opt']['String1']
-                    self.correct_counter += 1
-                    self.write_to_file("Picked up " + name, time)
-
-                elif command == "DoorStatus":
-                    self.episode = int(instr['Command' + str(command_idx)]['Opt']['Num1'])
-                    time = int(instr['Command' + str(command_idx)]['Opt']['Num2'])
-                    name = instr['Command' + str(command_idx)]['Opt']['String1']
-                    status = instr['Command' + str(command_idx)]['Opt']['String2']
-                    self.write_to_file(name + ' ' + status, time)
-
-                elif command == "SetReward":
-                    self.episode = int(instr['Command' + str(command_idx)]['Opt']['Num1'])
-                    time = int(instr['Command' + str(command_idx)]['Opt']['Num2'])
-                    name = instr['Command' + str(command_idx)]['Opt']['String1']
-                    self.write_to_file("Set reward " + name, time)
-
-                elif command == "LostReward":
-                    self.episode = int(instr['Command' + str(command_idx)]['Opt']['Num1'])
-                    time = int(instr['Command' + str(command_idx)]['Opt']['Num2'])
-                    name = instr['Command' + str(command_idx)]['Opt']['String1']
-                    self.write_to_file("Lost reward " + name, time)
-
-    def done(self, obs):
-        instr = obs['INSTR']
-        if instr:
-            instr = json.loads(instr)
-            for command_idx in range(1, instr['nCommands'] + 1):
-                command = instr['Command' + str(command_idx)]['Command']
-                if command == "EpisodeFinished":
-                    return True
-        return False
+        self.clear_report_path()
+        if report_format == 'csv':
+            self._report = CsvReportWriter(path, rank, self.report_columns, queue_size=queue_size, on_full=on_full)
+        elif report_format == 'eventlog':
+            from .eventlog import EventLogWriter
+            self._report = EventLogWriter(path, rank, self.report_columns)
+        else:
+            raise Exception('Report format %s not supported' % (report_format))
+        self.task.report = self._report
+        if record_instr:
+            # The raw INSTR stream can be replayed offline by gym_deepmindlab.replay.
+            self._instr_recorder = InstrRecorder(path, rank, self.task.family)
+        if live_stats:
+            # Counters and throughput are published in rat{rank}.stats for gym_deepmindlab.monitor.
+            from .monitor import LiveStatsWriter
+            self._live_stats = LiveStatsWriter(path, rank, self.task.family, self.report_columns,
+                                               counters=self.task.counters())
+
+    def clear_report_path(self):
+        """Closes the report and the INSTR recording; events are no longer scored until set_report_path()."""
+        if self._report is not None:
+            self._report.close()
+            self._report = None
+        self.task.report = None
+        if self._instr_recorder is not None:
+            self._instr_recorder.close()
+            self._instr_recorder = None
+        if self._live_stats is not None:
+            self._live_stats.close(self.task.counters())
+            self._live_stats = None
+
+    @property
+    def sound_on(self):
+        return self.task.sound_on
+
+    @property
+    def distractor_on(self):
+        return self.task.distractor_on
+
+    @property
+    def episode(self):
+        return self.task.episode
+
+    @property
+    def position(self):
+        return self.task.position
+
+    def done(self, events):
+        return episode_finished(events)
 
     def step(self, action):
         if not self._lab.is_running():
             infos = {'sound_status': self.sound_on,
                      'distractor_status': self.distractor_on,
-                     'episode': {'r': self.total_reward,
-                                 'l': self.len,
-                                 't': time.time() - self.start}}
+                     'episode': self._episode_info()}
             self.reset()
-            return self._last_observation, 0.0, False, infos
-        obs = self._lab.observations()
-        self._last_observation = obs[self._colors] if obs[self._colors] is not None else self._last_observation
-        reward = self._lab.step(ACTION_LIST[action], num_steps=1)
-        done = self.done(obs)
-        self.process_command(obs)
+            return self._observation(), 0.0, False, infos
+        if self._frame_skip > 1 and self._instr:
+            # lab_step includes the observations and the INSTR decoding of every frame.
+            reward, events = self._timed(LAB_STEP, self._step_frames, ACTION_LIST[action])
+        else:
+            reward = self._timed(LAB_STEP, self._lab.step, ACTION_LIST[action], num_steps=self._frame_skip)
+            events = self._read_events()
+        done = self.done(events)
+        self.last_events = events
+        self._timed(PROCESS_COMMAND, self.task.process_command, events)
         self.len += 1
         self.total_reward += reward
         if done:
             infos = {'sound_status': self.sound_on,
                      'distractor_status': self.distractor_on,
-                     'episode': {'r': self.total_reward,
-                                 'l': self.len,
-                                 't': time.time() - self.start}}
+                     'episode': self._episode_info()}
             self.total_reward = 0.0
             self.len = 0
             self.start = time.time()
-            self.episode += 1
+            self.task.episode += 1
+            if self._report is not None:
+                self._report.flush(close_files=True, wait=False)
         else:
             infos = {'sound_status': self.sound_on,
                      'distractor_status': self.distractor_on,}
-        return self._last_observation, reward, done, infos
+        if self._live_stats is not None:
+            self._live_stats.step(events, done, self.task)
+        return self._observation(), reward, done, infos
+
+    def _timed(self, phase, fn, *args, **kwargs):
+        """Calls fn and, with instrumentation enabled, records its time under phase."""
+        if self._timer is None:
+            return fn(*args, **kwargs)
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self._timer.record(phase, time.perf_counter() - start)
+        return result
+
+    def _read_observations(self):
+        obs = self._lab.observations()
+        self._store_frame(obs[self._colors])
+        return obs
 
-    def reset(self):
-        self._lab.reset()
+    def _read_events(self):
+        """Reads the observations after a Lab step and returns its INSTR events."""
         if not self._lab.is_running():
+            if self._instr:
+                self.truncated_steps += 1
+            return NO_EVENTS
+        obs = self._timed(OBSERVATIONS, self._read_observations)
+        if not self._instr:
+            return NO_EVENTS
+        events = self._timed(INSTR_PARSE, parse_instr, obs['INSTR'])
+        if self._instr_recorder is not None and events:
+            self._instr_recorder.instr(obs['INSTR'])
+        return events
+
+    def _step_frames(self, action):
+        """Steps frame_skip frames one at a time and returns the reward and the INSTR events of all of them.
+
+        Reading INSTR after every frame keeps the events of the frames before
+        the end of a Lab episode, which a single Lab.step() call would lose,
+        whether or not the level keeps its commands until they are read.
+        """
+        reward = 0.0
+        events = []
+        obs = None
+        for _ in range(self._frame_skip):
+            reward += self._lab.step(action, num_steps=1)
+            if not self._lab.is_running():
+                self.truncated_steps += 1
+                break
+            obs = self._lab.observations()
+            if obs['INSTR']:
+                events.extend(parse_instr(obs['INSTR']))
+                if self._instr_recorder is not None:
+                    self._instr_recorder.instr(obs['INSTR'])
+        if obs is not None:
+            self._store_frame(obs[self._colors])
+        return reward, events or NO_EVENTS
+
+    def _store_frame(self, frame):
+        if frame is not None:
+            np.copyto(self._frame, frame)
+
+    def _observation(self):
+        if self._copy_obs:
+            return self._frame.copy()
+        return self._frame_view
+
+    def _prepare_standby(self, lab, seed=None):
+        if callable(lab):
+            lab = lab()
+        if seed is not None:
+            lab.reset(seed=seed)
+        else:
+            lab.reset()
+        if not lab.is_running():
+            lab.reset()
+        lab.step(ACTION_LIST[0], num_steps=1)
+        return lab, lab.observations()[self._colors]
+
+    def _swap_standby(self):
+        if self._standby.done():
+            self.prereset_ready += 1
+        else:
+            self.prereset_waited += 1
+            wait_start = time.perf_counter()
+            concurrent.futures.wait([self._standby])
+            self.prereset_wait_time += time.perf_counter() - wait_start
+        lab, frame = self._standby.result()
+        previous, self._lab = self._lab, lab
+        self._standby = self._standby_executor.submit(self._prepare_standby, previous)
+        return frame
+
+    def get_prereset_stats(self):
+        """Counts how often the standby Lab was ready at reset() and how long reset() waited for it."""
+        return {'ready': self.prereset_ready,
+                'waited': self.prereset_waited,
+                'wait_time': self.prereset_wait_time}
+
+    def reset(self):
+        if self._timer is not None:
+            reset_start = time.perf_counter()
+        if self._standby is not None:
+            self._store_frame(self._swap_standby())
+        else:
             self._lab.reset()
-        self._lab.step(ACTION_LIST[0], num_steps=1)
-        self._last_observation = self._lab.observations()[self._colors]
+            if not self._lab.is_running():
+                self._lab.reset()
+            self._lab.step(ACTION_LIST[0], num_steps=1)
+            self._store_frame(self._lab.observations()[self._colors])
         self.start = time.time()
         self.total_reward = 0.0
         self.len = 0
 
-        self.sound_on = None
-        self.distractor_on = None
-        self.rat_left_base_during_reward_time = False
-        self.rat_left_during_distractor = False
-        self.episode = 0
-        self.position = "base1"
-        self.missed_counter = 0
-        self.early_counter = 0
-        self.late_counter = 0
-        self.correct_counter = 0
-        self.distractor_counter = 0
-        self.correct_distractor_counter = 0
-        return self._last_observation
+        if self._live_stats is not None and self._lab_episode_started:
+            self._live_stats.end_lab_episode(self.task.counters())
+        self._lab_episode_started = True
+        self.task.reset()
+        self.last_events = NO_EVENTS
+        if self._instr_recorder is not None:
+            self._instr_recorder.reset()
+        if self._timer is not None:
+            self._timer.record(RESET, time.perf_counter() - reset_start)
+        return self._observation()
 
     def seed(self, seed=None):
         self._lab.reset(seed=seed)
+        if self._standby is not None:
+            # The standby continues the seed sequence of the active Lab.
+            lab, _ = self._standby.result()
+            self._standby = self._standby_executor.submit(self._prepare_standby, lab,
+                                                          None if seed is None else seed + 1)
         self.np_random, _ = seeding.np_random(seed)
 
     def close(self):
-        self._lab.close()
+        self.clear_report_path()
+        try:
+            if self._standby is not None:
+                standby, self._standby = self._standby, None
+                self._standby_executor.shutdown()
+                lab, _ = standby.result()
+                lab.close()
+        finally:
+            self._lab.close()
 
     def render(self, mode='rgb_array', close=False):
         if mode == 'rgb_array':
-            return self._lab.observations()[self._colors]
+            return self._frame.copy()
         # elif mode is 'human':
         #   pop up a window and render
         else:
@@ -0,0 +1,191 @@
+import os
+import struct
+
+import numpy as np
+
+from .writer import _open_writers
+
+MAGIC = b'GDMLEVLG'
+VERSION = 2
+HEADER = struct.Struct('<8sHHI')
+
+COUNTERS = ('missed', 'early', 'late', 'distracted', 'dist.OK', 'correct')
+COUNTER_FIELDS = ('missed', 'early', 'late', 'distracted', 'dist_ok', 'correct')
+
+# The task counters are cumulative over a Lab episode while the episode
+# numbers restart with every Lab episode, so records also carry a sequence
+# number of the Lab episode of the writer.
+RECORD_DTYPE = np.dtype([('lab_episode', '<u4'), ('episode', '<i4'), ('timestamp', '<f8'), ('event', '<u2')] +
+                        [(field, '<i4') for field in COUNTER_FIELDS])
+
+# Events with a fixed code. Other event names, such as the door and reward
+# names of the memory task, get the next free code and are appended to the
+# rat{rank}.names file next to the log.
+EVENT_NAMES = (
+    'not_in_base', 'in_base', 'left_early', 'rat_left_base_during_reward_time',
+    'rat_left_during_distractor', 'reward_time_started', 'correct_or_late',
+    'missed_trial', 'correct_trial', 'distractor_time_started', 'distractor_avoided',
+)
+
+
+def log_name(path, rank):
+    return os.path.join(str(path), 'rat' + str(rank) + '.evlog')
+
+
+def names_name(path, rank):
+    return os.path.join(str(path), 'rat' + str(rank) + '.names')
+
+
+def _columns_mask(columns):
+    mask = 0
+    for column in columns:
+        mask |= 1 << COUNTERS.index(column)
+    return mask
+
+
+def _mask_columns(mask):
+    return tuple(column for i, column in enumerate(COUNTERS) if mask & (1 << i))
+
+
+def _read_names(names_path):
+    names = list(EVENT_NAMES)
+    if os.path.exists(names_path):
+        with open(names_path, 'r') as f:
+            names.extend(line.rstrip('\n') for line in f)
+    return names
+
+
+def _record_count(file_name):
+    return (os.path.getsize(file_name) - HEADER.size) // RECORD_DTYPE.itemsize
+
+
+def _truncate(file_name, size):
+    if os.path.getsize(file_name) > size:
+        os.truncate(file_name, size)
+
+
+class EventLogWriter:
+    """Appends fixed-width event records to one rat{rank}.evlog file per rank.
+
+    Records are collected in a chunk of chunk_size records and written with a
+    single call when the chunk is full, on flush() and on close(). It has the
+    same interface as CsvReportWriter. end_lab_episode() starts a new Lab
+    episode; reopening a log continues after the Lab episode of its last
+    record.
+    """
+
+    def __init__(self, path, rank, columns, chunk_size=4096):
+        self.path = path
+        self.rank = rank
+        self.columns = tuple(columns)
+        self.dropped = 0
+        mask = _columns_mask(self.columns)
+        self._slots = [COUNTER_FIELDS[COUNTERS.index(column)] for column in self.columns]
+
+        file_name = log_name(path, rank)
+        if os.path.exists(file_name) and os.path.getsize(file_name) >= HEADER.size:
+            with open(file_name, 'rb') as f:
+                magic, version, record_size, file_mask = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize or file_mask != mask:
+                raise Exception('%s is not a compatible event log' % file_name)
+            # A crashed writer can leave a partial record, which would shift
+            # every record appended after it.
+            _truncate(file_name, HEADER.size + _record_count(file_name) * RECORD_DTYPE.itemsize)
+            records = EventLog(file_name).records
+            self.lab_episode = int(records[-1]['lab_episode']) + 1 if len(records) else 0
+            self._file = open(file_name, 'ab')
+        else:
+            self.lab_episode = 0
+            self._file = open(file_name, 'wb')
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, mask))
+        self._lab_episode_records = 0
+
+        self._names_file = names_name(path, rank)
+        if os.path.exists(self._names_file):
+            with open(self._names_file, 'rb') as f:
+                names = f.read()
+            _truncate(self._names_file, names.rfind(b'\n') + 1)
+        self._codes = {name: code for code, name in enumerate(_read_names(self._names_file))}
+        self._new_names = []
+        self._chunk = np.zeros(chunk_size, dtype=RECORD_DTYPE)
+        self._size = 0
+        self._closed = False
+        _open_writers.add(self)
+
+    def _code(self, type_event):
+        code = self._codes.get(type_event)
+        if code is None:
+            code = len(self._codes)
+            self._codes[type_event] = code
+            self._new_names.append(type_event)
+        return code
+
+    def write_event(self, episode, type_event, seconds, counters):
+        if self._closed:
+            raise ValueError('write to a closed event log')
+        record = self._chunk[self._size]
+        record['lab_episode'] = self.lab_episode
+        record['episode'] = int(episode)
+        record['timestamp'] = seconds
+        record['event'] = self._code(type_event)
+        for slot, value in zip(self._slots, counters):
+            record[slot] = value
+        self._size += 1
+        self._lab_episode_records += 1
+        if self._size == len(self._chunk):
+            self._write_chunk()
+
+    def end_lab_episode(self):
+        if self._lab_episode_records:
+            self.lab_episode += 1
+            self._lab_episode_records = 0
+
+    def _write_chunk(self):
+        if self._new_names:
+            with open(self._names_file, 'a') as f:
+                f.writelines(name + '\n' for name in self._new_names)
+            self._new_names = []
+        if self._size:
+            self._file.write(self._chunk[:self._size].tobytes())
+            self._chunk[:self._size] = 0
+            self._size = 0
+
+    def flush(self, close_files=False, wait=True):
+        if self._closed:
+            return
+        self._write_chunk()
+        self._file.flush()
+
+    def close(self):
+        if self._closed:
+            return
+        self._write_chunk()
+        self._file.close()
+        self._closed = True
+        _open_writers.discard(self)
+
+
+class EventLog:
+    """Read-only, memory-mapped view of one rat{rank}.evlog file."""
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        with open(file_name, 'rb') as f:
+            magic, version, record_size, mask = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+            raise Exception('%s is not a compatible event log' % file_name)
+        self.columns = _mask_columns(mask)
+        self.names = _read_names(os.path.splitext(file_name)[0] + '.names')
+
+        # A crashed writer can leave a partial record at the end of the file.
+        count = _record_count(file_name)
+        if count:
+            self.records = np.memmap(file_name, dtype=RECORD_DTYPE, mode='r', offset=HEADER.size, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def counters(self):
+        return [COUNTER_FIELDS[COUNTERS.index(column)] for column in self.columns]
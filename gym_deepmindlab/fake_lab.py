@@ -0,0 +1,202 @@
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from .instr import POSITION, PICKUP, INDICATION_STATUS, DOOR_STATUS, SET_REWARD, LOST_REWARD, EPISODE_FINISHED
+
+# Scripted task events, as (second within the trial, command, options).
+# The trials repeat until the task episode ends.
+SOUND_SCRIPT = [
+    (1, POSITION, {'String1': 'corridor'}),
+    (3, POSITION, {'String1': 'base1'}),
+    (4, INDICATION_STATUS, {'String1': 'sound_on'}),
+    (5, POSITION, {'String1': 'corridor'}),
+    (6, PICKUP, {'String1': 'reward'}),
+    (7, INDICATION_STATUS, {'String1': 'sound_off'}),
+    (8, POSITION, {'String1': 'base1'}),
+    (10, INDICATION_STATUS, {'String1': 'distractor_on'}),
+    (11, POSITION, {'String1': 'corridor'}),
+    (12, POSITION, {'String1': 'base1'}),
+    (16, INDICATION_STATUS, {'String1': 'distractor_off'}),
+    (18, INDICATION_STATUS, {'String1': 'sound_on'}),
+    (24, INDICATION_STATUS, {'String1': 'sound_off'}),
+]
+
+NOSE_POKE_SCRIPT = [
+    (1, POSITION, {'String1': 'nose_poke'}),
+    (2, POSITION, {'String1': 'base1'}),
+    (4, INDICATION_STATUS, {'String1': 'sound_on'}),
+    (5, POSITION, {'String1': 'nose_poke'}),
+    (6, PICKUP, {'String1': 'reward'}),
+    (7, POSITION, {'String1': 'base1'}),
+    (9, INDICATION_STATUS, {'String1': 'sound_off'}),
+    (10, INDICATION_STATUS, {'String1': 'distractor_on'}),
+    (16, INDICATION_STATUS, {'String1': 'distractor_off'}),
+    (18, INDICATION_STATUS, {'String1': 'sound_on'}),
+    (24, INDICATION_STATUS, {'String1': 'sound_off'}),
+]
+
+MEMORY_SCRIPT = [
+    (1, SET_REWARD, {'String1': 'arm1'}),
+    (2, DOOR_STATUS, {'String1': 'door1', 'String2': 'open'}),
+    (3, POSITION, {'String1': 'arm1'}),
+    (4, PICKUP, {'String1': 'arm1'}),
+    (5, POSITION, {'String1': 'center'}),
+    (6, DOOR_STATUS, {'String1': 'door1', 'String2': 'closed'}),
+    (8, SET_REWARD, {'String1': 'arm2'}),
+    (9, POSITION, {'String1': 'arm3'}),
+    (12, LOST_REWARD, {'String1': 'arm2'}),
+    (13, POSITION, {'String1': 'center'}),
+]
+
+TRIAL_SECONDS = 25
+
+
+def _script(level):
+    if 'sound' in level:
+        return SOUND_SCRIPT
+    elif 'nose' in level:
+        return NOSE_POKE_SCRIPT
+    elif 'memory' in level:
+        return MEMORY_SCRIPT
+    return []
+
+
+class FakeLab:
+    """In-process stand-in for deepmind_lab.Lab.
+
+    It renders synthetic frames of the configured size and, for the sound,
+    nose poke and memory levels, emits a scripted INSTR command stream.
+    Commands are queued until the INSTR observation is read; pass
+    queue_instr=False to replace them every frame instead, as a level script
+    may do.
+    A task episode (ended by EpisodeFinished) lasts task_episode_seconds and
+    the Lab episode ends after episode_seconds.
+
+    Map compilation is simulated with compile_seconds of sleep and goes
+    through level_cache like in the real Lab. The nav_maze_random_goal levels
+    compile a new map on every reset.
+    """
+
+    def __init__(self, level, observations, config=None, renderer='software', level_cache=None,
+                 episode_seconds=300, task_episode_seconds=100, compile_seconds=0.0, queue_instr=True):
+        config = config or {}
+        self.level = level
+        self.observation_names = list(observations)
+        self.width = int(config.get('width', 320))
+        self.height = int(config.get('height', 240))
+        self.fps = int(config.get('fps', 60))
+        self.level_cache = level_cache
+        self.compile_seconds = compile_seconds
+        self.queue_instr = queue_instr
+        self.compiled_maps = 0
+        self.episode_frames = episode_seconds * self.fps
+        self.task_episode_frames = task_episode_seconds * self.fps
+
+        self._script = {second * self.fps: (command, opt) for second, command, opt in _script(level)}
+        self._trial_frames = TRIAL_SECONDS * self.fps
+        self._pixels = np.random.RandomState(0).randint(0, 256, (self.height, self.width, 3)).astype(np.uint8)
+        self._running = False
+        self._closed = False
+        self._frame = 0
+        self._episode = 0
+        self._commands = []
+        self._resets = 0
+        self._map_key = None
+        self._load_map()
+
+    def _load_map(self):
+        key = '%s_%dx%d' % (self.level, self.width, self.height)
+        if 'random' in self.level:
+            key += '_%d' % self._resets
+        key += '.pk3'
+        if key == self._map_key:
+            return
+        self._map_key = key
+        fd, pk3_path = tempfile.mkstemp(suffix='.pk3')
+        os.close(fd)
+        try:
+            if self.level_cache is not None and self.level_cache.fetch(key, pk3_path):
+                return
+            time.sleep(self.compile_seconds)
+            self.compiled_maps += 1
+            with open(pk3_path, 'wb') as f:
+                f.write(key.encode() * 64)
+            if self.level_cache is not None:
+                self.level_cache.write(key, pk3_path)
+        finally:
+            os.unlink(pk3_path)
+
+    def reset(self, episode=-1, seed=None):
+        if self._closed:
+            raise RuntimeError('Environment is closed')
+        if seed is not None:
+            self._pixels = np.random.RandomState(seed).randint(0, 256, self._pixels.shape).astype(np.uint8)
+        self._resets += 1
+        self._load_map()
+        self._running = True
+        self._frame = 0
+        self._episode = 0
+        self._commands = []
+        return True
+
+    def is_running(self):
+        return self._running
+
+    def _emit(self, command, opt):
+        self._commands.append((command, dict(opt, Num1=self._episode, Num2=self._frame / float(self.fps))))
+
+    def step(self, action, num_steps=1):
+        if not self._running:
+            raise RuntimeError('Environment needs to be reset')
+        reward = 0.0
+        for _ in range(num_steps):
+            self._frame += 1
+            if not self.queue_instr:
+                self._commands = []
+            scripted = self._script.get(self._frame % self._trial_frames)
+            if scripted is not None:
+                self._emit(*scripted)
+                if scripted[0] == PICKUP:
+                    reward += 1.0
+            if self._frame % self.task_episode_frames == 0:
+                self._emit(EPISODE_FINISHED, {})
+                self._episode += 1
+            if self._frame >= self.episode_frames:
+                self._running = False
+                break
+        return reward
+
+    def observations(self):
+        if not self._running:
+            raise RuntimeError('Environment needs to be reset')
+        obs = {}
+        for name in self.observation_names:
+            if name == 'INSTR':
+                obs[name] = self._instr()
+            else:
+                # Like the real Lab, every call returns a new array.
+                frame = self._pixels.copy()
+                frame[0, 0, 0] = self._frame % 256
+                obs[name] = frame
+        return obs
+
+    def _instr(self):
+        if not self._commands:
+            return ''
+        instr = {'nCommands': len(self._commands)}
+        for idx, (command, opt) in enumerate(self._commands, 1):
+            instr['Command' + str(idx)] = {'Command': command, 'Opt': opt}
+        self._commands = []
+        return json.dumps(instr)
+
+    def num_steps(self):
+        return self._frame
+
+    def close(self):
+        self._running = False
+        self._closed = True
+        return True
@@ -0,0 +1,41 @@
+import json
+from collections import namedtuple
+
+POSITION = 'Position'
+PICKUP = 'Pickup'
+INDICATION_STATUS = 'IndicationStatus'
+DOOR_STATUS = 'DoorStatus'
+SET_REWARD = 'SetReward'
+LOST_REWARD = 'LostReward'
+TIMEOUT = 'Timeout'
+EPISODE_FINISHED = 'EpisodeFinished'
+
+COMMANDS = (POSITION, PICKUP, INDICATION_STATUS, DOOR_STATUS,
+            SET_REWARD, LOST_REWARD, TIMEOUT, EPISODE_FINISHED)
+
+# One decoded entry of the INSTR command stream. The fields mirror the
+# 'Opt' dictionary sent by the level; missing options are None.
+Event = namedtuple('Event', ['command', 'num1', 'num2', 'string1', 'string2'])
+
+NO_EVENTS = ()
+
+
+def parse_instr(instr):
+    if not instr:
+        return NO_EVENTS
+    instr = json.loads(instr)
+    events = []
+    for command_idx in range(1, instr['nCommands'] + 1):
+        entry = instr['Command' + str(command_idx)]
+        opt = entry.get('Opt') or {}
+        events.append(Event(entry['Command'],
+                            opt.get('Num1'), opt.get('Num2'),
+                            opt.get('String1'), opt.get('String2')))
+    return events
+
+
+def episode_finished(events):
+    for event in events:
+        if event.command == EPISODE_FINISHED:
+            return True
+    return False
@@ -0,0 +1,132 @@
+import contextlib
+import os
+import shutil
+import tempfile
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # not on Linux
+    fcntl = None
+
+LOCK_DIR = '.locks'
+TEMP_PREFIX = '.tmp-'
+# Keys are hashed into a fixed number of lock files, so levels with a new map
+# on every reset do not leave a lock file per map behind.
+LOCK_STRIPES = 64
+
+
+@contextlib.contextmanager
+def _locked(lock_path, blocking=True):
+    # Yields whether the lock was acquired; without fcntl it never blocks.
+    if fcntl is None:
+        yield True
+        return
+    with open(lock_path, 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class LevelCache:
+    """Filesystem cache of compiled levels, shared by all Lab instances on a host.
+
+    An instance is passed to deepmind_lab.Lab as level_cache; Lab calls fetch()
+    before compiling a map and write() after compiling it. Entries are written
+    to a temporary file and renamed into place under the lock of the key, so
+    concurrent workers never read a partial map. The locks are LOCK_STRIPES
+    files shared by all keys that hash to them. When max_bytes is set, the
+    least recently fetched entries are removed once the cache grows beyond it.
+    """
+
+    def __init__(self, cache_dir, max_bytes=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        os.makedirs(os.path.join(cache_dir, LOCK_DIR), exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _lock_path(self, key):
+        stripe = zlib.crc32(key.encode()) % LOCK_STRIPES
+        return os.path.join(self.cache_dir, LOCK_DIR, '%02d.lock' % stripe)
+
+    def fetch(self, key, pk3_path):
+        path = self._path(key)
+        try:
+            shutil.copyfile(path, pk3_path)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        try:
+            # The modification time orders the entries for eviction.
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+        return True
+
+    def write(self, key, pk3_path):
+        path = self._path(key)
+        with _locked(self._lock_path(key)):
+            if os.path.exists(path):
+                return
+            fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=self.cache_dir)
+            try:
+                with os.fdopen(fd, 'wb') as temp_file, open(pk3_path, 'rb') as source:
+                    shutil.copyfileobj(source, temp_file)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        self.writes += 1
+        if self.max_bytes is not None:
+            self.evict(keep=key)
+
+    def entries(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.startswith('.') or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.name))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        # Only one process evicts at a time; the others skip.
+        with _locked(os.path.join(self.cache_dir, LOCK_DIR, 'evict.lock'), blocking=False) as acquired:
+            if not acquired:
+                return
+            entries = sorted(self.entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in entries:
+                if total <= self.max_bytes:
+                    break
+                if name == keep:
+                    continue
+                with _locked(self._lock_path(name)):
+                    try:
+                        os.unlink(self._path(name))
+                    except FileNotFoundError:
+                        continue
+                total -= size
+                self.evictions += 1
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'writes': self.writes, 'evictions': self.evictions}
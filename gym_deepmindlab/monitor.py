@@ -0,0 +1,277 @@
+"""Live counters of running environments, published with set_report_path(..., live_stats=True).
+
+    python -m gym_deepmindlab.monitor reports/
+    python -m gym_deepmindlab.monitor reports/ --interval 5
+    python -m gym_deepmindlab.monitor reports/ --http 9100
+
+Every rank owns one fixed-size rat{rank}.stats file in the report path, which
+the env maps into memory and updates in place. Readers map the same files, so
+neither side does any file I/O per event.
+"""
+import argparse
+import glob
+import http.server
+import os
+import re
+import struct
+import sys
+import time
+
+import numpy as np
+
+from .eventlog import COUNTERS, COUNTER_FIELDS, _columns_mask, _mask_columns
+
+MAGIC = b'GDMLSTAT'
+VERSION = 1
+HEADER = struct.Struct('<8sHHI')
+HEADER_SIZE = 64
+
+STATS_DTYPE = np.dtype([('seq', '<u8'), ('pid', '<i8'), ('start', '<f8'), ('updated', '<f8'),
+                        ('steps', '<u8'), ('lab_episodes', '<u8'), ('task_episodes', '<u8'),
+                        ('episode_counters', '<i8', (len(COUNTERS),)),
+                        ('total_counters', '<i8', (len(COUNTERS),)),
+                        ('family', 'S16')])
+
+
+def stats_name(path, rank):
+    return os.path.join(str(path), 'rat' + str(rank) + '.stats')
+
+
+def _read_header(f, file_name):
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise Exception('%s is not a stats file' % file_name)
+    magic, version, mask, record_size = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION or record_size != STATS_DTYPE.itemsize:
+        raise Exception('%s is not a compatible stats file' % file_name)
+    return mask
+
+
+class LiveStatsWriter:
+    """Publishes the counters and throughput of one rank into its rat{rank}.stats file.
+
+    Updates follow a seqlock: seq is odd while a record is being written, so
+    readers retry instead of taking a lock. step() only writes to the map when
+    the step had INSTR events, ended a task episode, or every publish_every
+    steps. Reopening the file of a rank continues its totals; counters are
+    the task counters of the env at that point, which close() already added
+    to the totals.
+    """
+
+    def __init__(self, path, rank, family, columns, counters=None, publish_every=64):
+        self.file_name = stats_name(path, rank)
+        self.publish_every = publish_every
+        self._slots = [COUNTERS.index(column) for column in columns]
+        mask = _columns_mask(columns)
+
+        new_file = not os.path.exists(self.file_name) or \
+            os.path.getsize(self.file_name) != HEADER_SIZE + STATS_DTYPE.itemsize
+        if not new_file:
+            with open(self.file_name, 'rb') as f:
+                _read_header(f, self.file_name)
+        with open(self.file_name, 'r+b' if not new_file else 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, mask, STATS_DTYPE.itemsize).ljust(HEADER_SIZE, b'\0'))
+            if new_file:
+                f.write(np.zeros(1, dtype=STATS_DTYPE).tobytes())
+        self._map = np.memmap(self.file_name, dtype=STATS_DTYPE, mode='r+', offset=HEADER_SIZE, shape=(1,))
+
+        # Views of the fields, so that publishing is a few item assignments.
+        record = self._map
+        self._seq = record['seq']
+        self._updated = record['updated']
+        self._steps = record['steps']
+        self._lab_episodes = record['lab_episodes']
+        self._task_episodes = record['task_episodes']
+        self._episode_counters = record['episode_counters'][0]
+        self._total_counters = record['total_counters'][0]
+
+        if new_file:
+            record['start'] = time.time()
+        self.steps = int(self._steps[0])
+        self.lab_episodes = int(self._lab_episodes[0])
+        self.task_episodes = int(self._task_episodes[0])
+        self._counters = np.zeros(len(COUNTERS), dtype=np.int64)
+        if counters is not None:
+            self._counters[self._slots] = counters
+        self._base = self._total_counters - self._counters
+        self._seq[0] += 1
+        record['pid'] = os.getpid()
+        record['family'] = (family or '').encode()[:16]
+        self._episode_counters[:] = self._counters
+        self._seq[0] += 1
+
+    def publish(self, counters=None):
+        if counters is not None:
+            self._counters[self._slots] = counters
+        self._seq[0] += 1
+        self._steps[0] = self.steps
+        self._lab_episodes[0] = self.lab_episodes
+        self._task_episodes[0] = self.task_episodes
+        self._episode_counters[:] = self._counters
+        self._total_counters[:] = self._base + self._counters
+        self._updated[0] = time.time()
+        self._seq[0] += 1
+
+    def step(self, events, done, task):
+        self.steps += 1
+        if done:
+            self.task_episodes += 1
+        if events or done or self.steps % self.publish_every == 0:
+            self.publish(task.counters())
+
+    def end_lab_episode(self, counters):
+        """Adds the counters of the finished Lab episode to the totals; the task counters restart at 0."""
+        self._counters[self._slots] = counters
+        self._base += self._counters
+        self._counters[:] = 0
+        self.lab_episodes += 1
+        self.publish()
+
+    def close(self, counters=None):
+        if self._map is not None:
+            self.publish(counters)
+            self._map.flush()
+            self._map = None
+
+
+def read_stats(file_name, retries=100):
+    """Returns a consistent copy of the record of one stats file and its column mask."""
+    with open(file_name, 'rb') as f:
+        mask = _read_header(f, file_name)
+    record = np.memmap(file_name, dtype=STATS_DTYPE, mode='r', offset=HEADER_SIZE, shape=(1,))
+    for _ in range(retries):
+        seq = int(record['seq'][0])
+        if seq % 2 == 0:
+            copy = record.copy()
+            if int(record['seq'][0]) == seq:
+                return copy[0], mask
+        time.sleep(0.0001)
+    raise Exception('%s is being written too often to read it' % file_name)
+
+
+def _alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect(path):
+    """Reads the stats of every rank under path; returns one row per rank and the totals."""
+    rows = []
+    for file_name in glob.glob(os.path.join(path, 'rat*.stats')):
+        rank = re.match(r'rat(.+)\.stats$', os.path.basename(file_name)).group(1)
+        record, mask = read_stats(file_name)
+        elapsed = max(record['updated'] - record['start'], 1e-9)
+        row = {'rank': rank, 'family': record['family'].decode(), 'alive': _alive(record['pid']),
+               'steps': int(record['steps']), 'lab_episodes': int(record['lab_episodes']),
+               'task_episodes': int(record['task_episodes']), 'updated': float(record['updated']),
+               'steps_per_s': record['steps'] / elapsed}
+        for column in _mask_columns(mask):
+            field = COUNTER_FIELDS[COUNTERS.index(column)]
+            row[field] = int(record['total_counters'][COUNTERS.index(column)])
+        rows.append(row)
+    rows.sort(key=lambda row: (len(row['rank']), row['rank']))
+
+    total = {'rank': 'total', 'alive': sum(row['alive'] for row in rows)}
+    for row in rows:
+        for name, value in row.items():
+            if name in ('rank', 'family', 'alive', 'updated'):
+                continue
+            total[name] = total.get(name, 0) + value
+    for row in rows + [total]:
+        for field in COUNTER_FIELDS:
+            if field in row:
+                row[field + '_mean'] = row[field] / float(max(row['task_episodes'], 1))
+    return rows, total
+
+
+def _columns(rows):
+    columns = ['rank', 'family', 'alive', 'steps', 'steps_per_s', 'task_episodes']
+    for field in COUNTER_FIELDS:
+        if any(field in row for row in rows):
+            columns += [field, field + '_mean']
+    return columns
+
+
+def _with_rates(rows, total, previous, interval):
+    # Throughput over the last interval instead of since the start.
+    if previous is not None:
+        steps = {row['rank']: row['steps'] for row in previous[0]}
+        for row in rows:
+            row['steps_per_s'] = (row['steps'] - steps.get(row['rank'], 0)) / interval
+        total['steps_per_s'] = sum(row['steps_per_s'] for row in rows)
+    return rows, total
+
+
+def metrics_text(path):
+    """The stats of path in the Prometheus text format."""
+    rows, _ = collect(path)
+    lines = []
+    names = ['steps', 'lab_episodes', 'task_episodes', 'steps_per_s'] + list(COUNTER_FIELDS)
+    for name in names:
+        metric = 'gym_deepmindlab_' + name
+        lines.append('# TYPE %s %s' % (metric, 'gauge' if name == 'steps_per_s' else 'counter'))
+        for row in rows:
+            if name in row:
+                lines.append('%s{rank="%s",family="%s"} %s' % (metric, row['rank'], row['family'], row[name]))
+    return '\n'.join(lines) + '\n'
+
+
+def serve(path, port, host='127.0.0.1'):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = metrics_text(path).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    print('Serving the stats of %s on http://%s:%d/' % (path, host, server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    from .report import _print_table
+    parser = argparse.ArgumentParser(prog='python -m gym_deepmindlab.monitor',
+                                     description='Show the live counters of running environments.')
+    parser.add_argument('path', help='report path given to set_report_path')
+    parser.add_argument('--interval', type=float, default=None, help='refresh every INTERVAL seconds')
+    parser.add_argument('--http', type=int, default=None, metavar='PORT',
+                        help='serve the stats as text on localhost:PORT instead of printing them')
+    args = parser.parse_args(argv)
+
+    if args.http is not None:
+        serve(args.path, args.http)
+        return
+    previous = None
+    while True:
+        rows, total = _with_rates(*collect(args.path), previous=previous, interval=args.interval)
+        if not rows:
+            parser.error('no stats files found in %s' % args.path)
+        _print_table(rows + [total], _columns(rows), sys.stdout)
+        if args.interval is None:
+            break
+        previous = (rows, total)
+        try:
+            time.sleep(args.interval)
+        except KeyboardInterrupt:
+            break
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
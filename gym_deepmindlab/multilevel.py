@@ -0,0 +1,210 @@
+import collections
+import json
+import os
+import time
+
+import gym
+from gym.utils import seeding
+
+from . import LEVELS
+from .env import DeepmindLabEnv, english_names_of_actions
+
+
+def _rss():
+    """Resident set size of this process in bytes, or None where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def _level_key(scene, settings):
+    if not settings:
+        return scene
+    return scene + ' ' + json.dumps(settings, sort_keys=True)
+
+
+class DeepmindLabMultiLevelEnv(gym.Env):
+    """Switches between several scenes while keeping up to max_warm of them alive.
+
+    Every scene and settings combination gets its own DeepmindLabEnv, and with
+    it the reporting task of that scene. The reports of the scenes of one task
+    family go to a sub-directory of the report path named after the family
+    (or the scene when it has no task), as the files of a rank only hold one
+    family. The envs are kept in an LRU pool, so
+    switching back to a warm scene only costs a reset instead of building a new
+    Lab. reset(scene=...) selects the scene; without it the schedule decides:
+    None keeps the current scene, 'uniform' samples one of scenes, a dict maps
+    scenes to sampling weights and a callable gets the number of Lab episodes
+    started so far and returns the scene. The schedule is also consulted when
+    step() restarts a finished Lab episode, and these restarts are counted too.
+
+    get_switch_stats() reports the switch latencies, split into warm and cold
+    switches, and the memory each warm instance added to the process.
+    """
+    metadata = DeepmindLabEnv.metadata
+
+    def __init__(self, scenes, max_warm=3, schedule=None, scene_kwargs=None, **kwargs):
+        super(DeepmindLabMultiLevelEnv, self).__init__()
+        scenes = list(scenes)
+        for scene in scenes:
+            if not scene in LEVELS:
+                raise Exception('Scene %s not supported' % (scene))
+        if not scenes:
+            raise Exception('DeepmindLabMultiLevelEnv needs at least one scene')
+        if max_warm < 1:
+            raise Exception('max_warm must be at least 1, got %s' % (max_warm))
+        if isinstance(schedule, dict):
+            total = float(sum(schedule.values()))
+            self._weights = ([scene for scene in schedule], [schedule[scene] / total for scene in schedule])
+        elif schedule not in (None, 'uniform') and not callable(schedule):
+            raise Exception('Schedule %s not supported' % (schedule,))
+
+        self.scenes = scenes
+        self.max_warm = max_warm
+        self.schedule = schedule
+        self.scene_kwargs = scene_kwargs or {}
+        self.kwargs = kwargs
+        self._pool = collections.OrderedDict()
+        self._memory = {}
+        self._report_args = None
+        self._seed = None
+        self._resets = 0
+        self.np_random, _ = seeding.np_random(None)
+
+        self._switches = {'warm': [], 'cold': []}
+        self._evictions = 0
+
+        self.scene = scenes[0]
+        self._key = None
+        self.env, _ = self._activate(self.scene, {})
+        self.action_space = self.env.action_space
+        self.observation_space = self.env.observation_space
+
+    @property
+    def task(self):
+        return self.env.task
+
+    def _activate(self, scene, settings):
+        """Makes the env of scene and settings the active one; returns it and whether it was built."""
+        settings = dict(self.scene_kwargs.get(scene, {}), **settings)
+        key = _level_key(scene, settings)
+        if key == self._key:
+            return self.env, False
+        previous = self._pool.get(self._key)
+        if previous is not None and self._report_args is not None:
+            previous.clear_report_path()
+
+        env = self._pool.get(key)
+        cold = env is None
+        if cold:
+            while len(self._pool) >= self.max_warm:
+                evicted_key, evicted = self._pool.popitem(last=False)
+                evicted.close()
+                del self._memory[evicted_key]
+                self._evictions += 1
+            rss = _rss()
+            start = time.perf_counter()
+            env = DeepmindLabEnv(scene, **dict(self.kwargs, **settings))
+            if self._key is not None and env.observation_space.shape != self.observation_space.shape:
+                env.close()
+                raise Exception('Scene %s has observations of shape %s instead of %s' %
+                                (key, env.observation_space.shape, self.observation_space.shape))
+            if self._seed is not None:
+                env.seed(self._seed)
+            construct_seconds = time.perf_counter() - start
+            self._memory[key] = {'rss_bytes': None if rss is None else _rss() - rss,
+                                 'construct_seconds': construct_seconds}
+            self._pool[key] = env
+        else:
+            self._pool.move_to_end(key)
+        if self._report_args is not None:
+            self._set_report_path(env, scene)
+        self.scene = scene
+        self._key = key
+        self.env = env
+        return env, cold
+
+    def _scheduled_scene(self):
+        if self.schedule is None:
+            return self.scene
+        elif self.schedule == 'uniform':
+            return self.scenes[self.np_random.choice(len(self.scenes))]
+        elif callable(self.schedule):
+            return self.schedule(self._resets)
+        scenes, weights = self._weights
+        return scenes[self.np_random.choice(len(scenes), p=weights)]
+
+    def reset(self, scene=None, **settings):
+        """Resets the scheduled scene, or scene with settings overriding the constructor kwargs."""
+        if scene is None:
+            scene = self._scheduled_scene()
+        obs = self._reset(scene, settings)
+        self._resets += 1
+        return obs
+
+    def _reset(self, scene, settings):
+        start = time.perf_counter()
+        if not scene in LEVELS:
+            raise Exception('Scene %s not supported' % (scene))
+        key = self._key
+        env, cold = self._activate(scene, settings)
+        obs = env.reset()
+        if self._key != key:
+            self._switches['cold' if cold else 'warm'].append(time.perf_counter() - start)
+        return obs
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+        info['scene'] = self.scene
+        if 'episode' in info and not done:
+            # step() restarted the Lab episode; the schedule may pick another
+            # scene for the new one, which counts as one Lab episode either way.
+            scene = self._scheduled_scene()
+            if scene != self.scene:
+                obs = self._reset(scene, {})
+            self._resets += 1
+        return obs, reward, done, info
+
+    def seed(self, seed=None):
+        self._seed = seed
+        self.np_random, _ = seeding.np_random(seed)
+        for env in self._pool.values():
+            env.seed(seed)
+
+    def _set_report_path(self, env, scene):
+        path, rank, kwargs = self._report_args
+        env.set_report_path(os.path.join(str(path), env.task.family or scene), rank, **kwargs)
+
+    def set_report_path(self, path, rank, **kwargs):
+        """Reports the active scene to path/<family>; the report follows the env on every switch."""
+        os.makedirs(str(path), exist_ok=True)
+        self._report_args = (path, rank, kwargs)
+        self._set_report_path(self.env, self.scene)
+
+    def warm_scenes(self):
+        return list(self._pool)
+
+    def get_switch_stats(self):
+        stats = {'evictions': self._evictions, 'warm_instances': len(self._pool), 'instances': {}}
+        for kind, latencies in self._switches.items():
+            stats[kind] = {'count': len(latencies),
+                           'total': sum(latencies),
+                           'mean': sum(latencies) / len(latencies) if latencies else 0.0,
+                           'max': max(latencies) if latencies else 0.0}
+        for key, memory in self._memory.items():
+            stats['instances'][key] = dict(memory)
+        return stats
+
+    def render(self, mode='rgb_array'):
+        return self.env.render(mode)
+
+    def close(self):
+        for env in self._pool.values():
+            env.close()
+        self._pool.clear()
+        self._memory.clear()
+
+    def get_action_meanings(self):
+        return english_names_of_actions
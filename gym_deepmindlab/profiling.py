@@ -0,0 +1,54 @@
+import math
+
+LAB_STEP = 'lab_step'
+OBSERVATIONS = 'observations'
+INSTR_PARSE = 'instr_parse'
+PROCESS_COMMAND = 'process_command'
+REPORT_WRITE = 'report_write'
+RESET = 'reset'
+
+PHASES = (LAB_STEP, OBSERVATIONS, INSTR_PARSE, PROCESS_COMMAND, REPORT_WRITE, RESET)
+
+# Histogram bucket i counts the calls that took less than 2**i microseconds;
+# the last bucket also counts everything slower.
+HISTOGRAM_BUCKETS = 24
+
+
+def histogram_bounds():
+    return [2 ** i for i in range(HISTOGRAM_BUCKETS)]
+
+
+class PhaseTimer:
+    """Cumulative times, call counts and latency histograms of the phases of step() and reset()."""
+
+    def __init__(self):
+        self.hooks = []
+        self.reset()
+
+    def reset(self):
+        self.total = dict.fromkeys(PHASES, 0.0)
+        self.count = dict.fromkeys(PHASES, 0)
+        self.histogram = {phase: [0] * HISTOGRAM_BUCKETS for phase in PHASES}
+        self.episode_total = dict.fromkeys(PHASES, 0.0)
+
+    def record(self, phase, seconds):
+        self.total[phase] += seconds
+        self.episode_total[phase] += seconds
+        self.count[phase] += 1
+        micros = seconds * 1e6
+        bucket = 0 if micros < 1 else min(int(math.log2(micros)) + 1, HISTOGRAM_BUCKETS - 1)
+        self.histogram[phase][bucket] += 1
+        for hook in self.hooks:
+            hook(phase, seconds)
+
+    def end_episode(self):
+        totals = self.episode_total
+        self.episode_total = dict.fromkeys(PHASES, 0.0)
+        return totals
+
+    def stats(self):
+        return {phase: {'count': self.count[phase],
+                        'total': self.total[phase],
+                        'mean': self.total[phase] / self.count[phase] if self.count[phase] else 0.0,
+                        'histogram': list(self.histogram[phase])}
+                for phase in PHASES}
@@ -0,0 +1,238 @@
+"""Replay recorded INSTR streams through the task state machines.
+
+    python -m gym_deepmindlab.replay reports/
+    python -m gym_deepmindlab.replay reports/ --out replayed/ --format eventlog --processes 8
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import re
+import struct
+import zlib
+
+from .instr import parse_instr, episode_finished
+from .tasks import make_task
+from .writer import CsvReportWriter, _open_writers
+
+MAGIC = b'GDMLINSR'
+VERSION = 1
+HEADER = struct.Struct('<8sHH')
+CHUNK = struct.Struct('<I')
+RECORD = struct.Struct('<BI')
+
+RESET = 0
+INSTR = 1
+
+
+def recording_name(path, rank):
+    return os.path.join(str(path), 'rat' + str(rank) + '.instr')
+
+
+class InstrRecorder:
+    """Appends the raw INSTR stream of one rank to rat{rank}.instr.
+
+    Every non-empty INSTR observation and every reset is stored as a record;
+    records are zlib-compressed in chunks of about chunk_bytes.
+    """
+
+    def __init__(self, path, rank, family, chunk_bytes=1 << 20):
+        self.file_name = recording_name(path, rank)
+        self.family = family or ''
+        self.chunk_bytes = chunk_bytes
+        if os.path.exists(self.file_name) and os.path.getsize(self.file_name):
+            with open(self.file_name, 'rb') as f:
+                recorded_family = _read_header(f, self.file_name)
+                size = _complete_size(f)
+            if recorded_family != self.family:
+                raise Exception('%s records the %s task, not %s' % (self.file_name, recorded_family, self.family))
+            # read_recording() stops at a partial chunk left by a crash, so
+            # anything appended after it would be lost.
+            if os.path.getsize(self.file_name) > size:
+                os.truncate(self.file_name, size)
+            self._file = open(self.file_name, 'ab')
+        else:
+            self._file = open(self.file_name, 'wb')
+            family = self.family.encode()
+            self._file.write(HEADER.pack(MAGIC, VERSION, len(family)) + family)
+        self._buffer = bytearray()
+        self._closed = False
+        _open_writers.add(self)
+
+    def _add(self, kind, payload):
+        self._buffer += RECORD.pack(kind, len(payload))
+        self._buffer += payload
+        if len(self._buffer) >= self.chunk_bytes:
+            self._write_chunk()
+
+    def reset(self):
+        self._add(RESET, b'')
+
+    def instr(self, instr):
+        self._add(INSTR, instr.encode())
+
+    def _write_chunk(self):
+        if self._buffer:
+            data = zlib.compress(bytes(self._buffer))
+            self._file.write(CHUNK.pack(len(data)) + data)
+            self._buffer = bytearray()
+
+    def flush(self):
+        if not self._closed:
+            self._write_chunk()
+            self._file.flush()
+
+    def close(self):
+        if not self._closed:
+            self._write_chunk()
+            self._file.close()
+            self._closed = True
+            _open_writers.discard(self)
+
+
+def _read_header(f, file_name):
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise Exception('%s is not an INSTR recording' % file_name)
+    magic, version, family_size = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise Exception('%s is not a compatible INSTR recording' % file_name)
+    return f.read(family_size).decode()
+
+
+def _complete_size(f):
+    """Returns the size of the file up to the end of its last complete chunk; f is positioned after the header."""
+    size = f.tell()
+    while True:
+        header = f.read(CHUNK.size)
+        if len(header) < CHUNK.size:
+            return size
+        length = CHUNK.unpack(header)[0]
+        if len(f.read(length)) < length:
+            return size
+        size = f.tell()
+
+
+def read_recording(file_name):
+    """Returns the task family and the list of (kind, payload) records of a recording."""
+    records = []
+    with open(file_name, 'rb') as f:
+        family = _read_header(f, file_name)
+        while True:
+            size = f.read(CHUNK.size)
+            if len(size) < CHUNK.size:
+                break
+            data = f.read(CHUNK.unpack(size)[0])
+            try:
+                data = zlib.decompress(data)
+            except zlib.error:
+                # The last chunk of a crashed run can be incomplete.
+                break
+            offset = 0
+            while offset < len(data):
+                kind, length = RECORD.unpack_from(data, offset)
+                offset += RECORD.size
+                records.append((kind, data[offset:offset + length]))
+                offset += length
+    return family, records
+
+
+class _CountingReport:
+    def __init__(self):
+        self.rows = 0
+
+    def write_event(self, episode, type_event, seconds, counters):
+        self.rows += 1
+
+    def end_lab_episode(self):
+        pass
+
+    def flush(self, close_files=False, wait=True):
+        pass
+
+    def close(self):
+        pass
+
+
+def replay_file(file_name, out_path=None, report_format='csv', rank=None):
+    """Feeds one recording through its task state machine, as DeepmindLabEnv.step() does.
+
+    The reports are written to out_path in report_format; without out_path
+    only the final state is computed. Returns a summary dict.
+    """
+    if rank is None:
+        rank = re.match(r'rat(.+)\.instr$', os.path.basename(file_name)).group(1)
+    family, records = read_recording(file_name)
+    task = make_task(family or None)
+    if out_path is None:
+        report = _CountingReport()
+    elif report_format == 'csv':
+        report = CsvReportWriter(out_path, rank, task.columns)
+    elif report_format == 'eventlog':
+        from .eventlog import EventLogWriter
+        report = EventLogWriter(out_path, rank, task.columns)
+    else:
+        raise Exception('Report format %s not supported' % (report_format))
+    task.report = report
+
+    commands = 0
+    episodes = 0
+    try:
+        for kind, payload in records:
+            if kind == RESET:
+                task.reset()
+                continue
+            events = parse_instr(payload)
+            commands += len(events)
+            done = episode_finished(events)
+            task.process_command(events)
+            if done:
+                task.episode += 1
+                episodes += 1
+                report.flush(close_files=True, wait=False)
+    finally:
+        report.close()
+    return {'file': file_name, 'rank': rank, 'family': family, 'records': len(records), 'commands': commands,
+            'episodes': episodes, 'episode': task.episode,
+            'counters': dict(zip(task.columns, task.counters()))}
+
+
+def _replay_one(args):
+    return replay_file(*args)
+
+
+def replay(file_names, out_path=None, report_format='csv', processes=None):
+    """Replays many recordings in parallel worker processes."""
+    if out_path is not None and not os.path.exists(out_path):
+        os.makedirs(out_path)
+    jobs = [(file_name, out_path, report_format) for file_name in file_names]
+    if processes == 1 or len(jobs) <= 1:
+        return [_replay_one(job) for job in jobs]
+    with multiprocessing.Pool(processes) as pool:
+        return pool.map(_replay_one, jobs, chunksize=1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m gym_deepmindlab.replay',
+                                     description='Replay recorded INSTR streams through the task state machines.')
+    parser.add_argument('path', help='directory with rat{rank}.instr recordings, or a single recording')
+    parser.add_argument('--out', help='write the replayed reports to this directory')
+    parser.add_argument('--format', default='csv', choices=['csv', 'eventlog'])
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.path):
+        file_names = sorted(glob.glob(os.path.join(args.path, 'rat*.instr')))
+    else:
+        file_names = [args.path]
+    if not file_names:
+        parser.error('no recordings found in %s' % args.path)
+
+    for result in replay(file_names, args.out, args.format, args.processes):
+        counters = ' '.join('%s=%s' % item for item in result['counters'].items())
+        print('rank %s: %d commands, %d episodes, %s' % (result['rank'], result['commands'], result['episodes'],
+                                                          counters))
+
+
+if __name__ == '__main__':
+    main()
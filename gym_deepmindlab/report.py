@@ -0,0 +1,164 @@
+"""Aggregate the binary event logs written with set_report_path(..., report_format='eventlog').
+
+    python -m gym_deepmindlab.report summary reports/
+    python -m gym_deepmindlab.report episodes reports/ --rank 0
+    python -m gym_deepmindlab.report export-csv reports/ --out reports_csv/
+"""
+import argparse
+import csv
+import glob
+import os
+import re
+import sys
+
+import numpy as np
+
+from .eventlog import EventLog, COUNTER_FIELDS
+from .writer import format_time_stamp
+
+
+def find_logs(path):
+    logs = {}
+    for file_name in glob.glob(os.path.join(path, 'rat*.evlog')):
+        match = re.match(r'rat(.+)\.evlog$', os.path.basename(file_name))
+        logs[match.group(1)] = EventLog(file_name)
+    return dict(sorted(logs.items(), key=lambda item: (len(item[0]), item[0])))
+
+
+def episode_table(log):
+    """Returns a structured array with one row per task episode of every Lab episode.
+
+    The task counters are cumulative over a Lab episode, so the counters of a
+    row are the values of the last event of the episode minus those of the
+    last event of the previous episode of the same Lab episode.
+    """
+    records = log.records
+    counters = log.counters()
+    dtype = [('lab_episode', '<u4'), ('episode', '<i4'), ('events', '<i8'), ('start', '<f8'), ('end', '<f8')] + \
+            [(field, '<i4') for field in counters]
+    if not len(records):
+        return np.zeros(0, dtype=dtype)
+
+    lab_episodes = np.asarray(records['lab_episode'])
+    episodes = np.asarray(records['episode'])
+    order = np.lexsort((episodes, lab_episodes))
+    sorted_lab_episodes = lab_episodes[order]
+    sorted_episodes = episodes[order]
+    boundaries = np.flatnonzero((sorted_episodes[1:] != sorted_episodes[:-1]) |
+                                (sorted_lab_episodes[1:] != sorted_lab_episodes[:-1])) + 1
+    first = np.concatenate(([0], boundaries))
+    last = np.concatenate((boundaries - 1, [len(order) - 1]))
+
+    table = np.zeros(len(first), dtype=dtype)
+    table['lab_episode'] = sorted_lab_episodes[first]
+    table['episode'] = sorted_episodes[first]
+    table['events'] = last - first + 1
+    timestamps = np.asarray(records['timestamp'])[order]
+    table['start'] = np.minimum.reduceat(timestamps, first)
+    table['end'] = np.maximum.reduceat(timestamps, first)
+    last_records = records[order[last]]
+    # The first episode of a Lab episode starts from 0.
+    continues = np.concatenate(([False], table['lab_episode'][1:] == table['lab_episode'][:-1]))
+    for field in counters:
+        values = np.asarray(last_records[field], dtype=np.int64)
+        previous = np.concatenate(([0], values[:-1]))
+        table[field] = values - np.where(continues, previous, 0)
+    return table
+
+
+def summary(logs):
+    rows = []
+    for rank, log in logs.items():
+        table = episode_table(log)
+        row = {'rank': rank, 'episodes': len(table), 'events': len(log)}
+        for field in COUNTER_FIELDS:
+            if field in log.counters():
+                row[field] = int(table[field].sum())
+                row[field + '_mean'] = float(table[field].mean()) if len(table) else 0.0
+        rows.append(row)
+    return rows
+
+
+def _print_table(rows, columns, out):
+    out.write(' '.join('%12s' % column for column in columns) + '\n')
+    for row in rows:
+        cells = []
+        for column in columns:
+            value = row.get(column, '')
+            cells.append('%12.3f' % value if isinstance(value, float) else '%12s' % value)
+        out.write(' '.join(cells) + '\n')
+
+
+def export_csv(log, rank, out_path):
+    """Writes the records of one rank in the layout of the legacy CSV reports."""
+    if not os.path.exists(out_path):
+        os.makedirs(out_path)
+    counters = log.counters()
+    header = ['time_stamp', 'event'] + list(log.columns)
+    records = log.records
+    files = {}
+    try:
+        for episode, timestamp, event, values in zip(records['episode'].tolist(), records['timestamp'].tolist(),
+                                                     records['event'].tolist(),
+                                                     zip(*(records[field].tolist() for field in counters))):
+            entry = files.get(episode)
+            if entry is None:
+                fd = open(os.path.join(out_path, 'rat' + str(rank) + '_' + str(episode) + '.csv'), 'w', newline='')
+                entry = files[episode] = fd, csv.writer(fd)
+                entry[1].writerow(header)
+            entry[1].writerow([format_time_stamp(episode, timestamp), log.names[event]] + list(values))
+    finally:
+        for fd, _ in files.values():
+            fd.close()
+    return len(files)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m gym_deepmindlab.report',
+                                     description='Aggregate gym_deepmindlab event logs.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    summary_parser = subparsers.add_parser('summary', help='per-rank statistics')
+    summary_parser.add_argument('path')
+
+    episodes_parser = subparsers.add_parser('episodes', help='per-episode statistics')
+    episodes_parser.add_argument('path')
+    episodes_parser.add_argument('--rank', action='append', help='only show these ranks')
+
+    export_parser = subparsers.add_parser('export-csv', help='write the legacy rat{rank}_{episode}.csv files')
+    export_parser.add_argument('path')
+    export_parser.add_argument('--out', help='output directory (default: the log directory)')
+    export_parser.add_argument('--rank', action='append', help='only export these ranks')
+
+    args = parser.parse_args(argv)
+    logs = find_logs(args.path)
+    if not logs:
+        parser.error('no event logs found in %s' % args.path)
+
+    if args.command == 'summary':
+        rows = summary(logs)
+        columns = ['rank', 'episodes', 'events']
+        for field in COUNTER_FIELDS:
+            if any(field in row for row in rows):
+                columns += [field, field + '_mean']
+        _print_table(rows, columns, sys.stdout)
+
+    elif args.command == 'episodes':
+        for rank, log in logs.items():
+            if args.rank and rank not in args.rank:
+                continue
+            table = episode_table(log)
+            rows = [dict(zip(table.dtype.names, row.tolist()), rank=rank) for row in table]
+            _print_table(rows, ['rank'] + list(table.dtype.names), sys.stdout)
+
+    elif args.command == 'export-csv':
+        for rank, log in logs.items():
+            if args.rank and rank not in args.rank:
+                continue
+            count = export_csv(log, rank, args.out or args.path)
+            print('rank %s: %d episodes' % (rank, count))
+
+
+if __name__ == '__main__':
+    main()
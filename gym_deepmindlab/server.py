@@ -0,0 +1,458 @@
+"""Serve a pool of DeepmindLabEnv instances to other processes over a Unix socket.
+
+    python -m gym_deepmindlab.server --socket /tmp/deepmindlab.sock --max-envs 16
+
+Learners connect with DeepmindLabRemoteEnv or DeepmindLabRemoteVectorEnv.
+Every message is a struct header with the sizes of a JSON part and of a raw
+payload; frames travel as raw uint8 bytes in the payload, never pickled.
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import threading
+import traceback
+
+import gym
+import numpy as np
+
+from .env import DeepmindLabEnv, ACTION_LIST, english_names_of_actions
+from .vector import STATUS_UNKNOWN, _status
+
+MESSAGE = struct.Struct('<IQ')
+
+
+def _json_default(value):
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    raise TypeError('%r is not JSON serializable' % (value,))
+
+
+def _recv_exactly(sock, view):
+    view = memoryview(view).cast('B')
+    received = 0
+    while received < len(view):
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise EOFError('Connection closed')
+        received += count
+
+
+def send_message(sock, header, payload=None):
+    data = json.dumps(header, default=_json_default).encode()
+    payload = b'' if payload is None else memoryview(payload).cast('B')
+    sock.sendall(MESSAGE.pack(len(data), len(payload)) + data)
+    if len(payload):
+        sock.sendall(payload)
+
+
+def recv_message(sock, out=None):
+    """Returns the JSON header and the payload; the payload is read into out when it is given."""
+    sizes = bytearray(MESSAGE.size)
+    _recv_exactly(sock, sizes)
+    header_size, payload_size = MESSAGE.unpack(sizes)
+    data = bytearray(header_size)
+    _recv_exactly(sock, data)
+    if out is None or out.nbytes != payload_size:
+        out = bytearray(payload_size)
+    _recv_exactly(sock, out)
+    return json.loads(data.decode()), out
+
+
+def _pool_key(scene, kwargs):
+    return scene + ' ' + json.dumps(kwargs, sort_keys=True)
+
+
+class EnvPool:
+    """The envs of a server. Envs are leased to one connection at a time.
+
+    Released envs stay alive in the idle pool, at most max_idle of them, and
+    are handed out again for the same scene and settings. Envs that were given
+    a report path are closed on release so that reports never mix learners.
+    """
+
+    def __init__(self, max_envs=16, max_idle=None, env_kwargs=None, threads=None):
+        self.max_envs = max_envs
+        self.max_idle = max_envs if max_idle is None else max_idle
+        self.env_kwargs = dict(env_kwargs or {})
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._envs = {}
+        self._keys = {}
+        self._leased = set()
+        self._idle = []
+        self._reported = set()
+        # Lab releases the GIL while it renders, so a batch steps in parallel.
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads or max_envs,
+                                                               thread_name_prefix='EnvPool')
+
+    def lease(self, scene, kwargs, count):
+        kwargs = dict(self.env_kwargs, **kwargs)
+        key = _pool_key(scene, kwargs)
+        ids = []
+        with self._lock:
+            for env_id in list(self._idle):
+                if len(ids) < count and self._keys[env_id] == key:
+                    self._idle.remove(env_id)
+                    ids.append(env_id)
+            new = count - len(ids)
+            # Idle envs of other scenes make room for new ones.
+            while new and len(self._envs) + new > self.max_envs and self._idle:
+                self._close(self._idle.pop(0))
+            if len(self._envs) + new > self.max_envs:
+                self._idle.extend(ids)
+                raise Exception('Server is full: %d of %d envs are leased' % (len(self._leased), self.max_envs))
+            new_ids = list(range(self._next_id, self._next_id + new))
+            self._next_id += new
+            # The slots are taken before the envs are built outside the lock.
+            for env_id in new_ids:
+                self._envs[env_id] = None
+                self._keys[env_id] = key
+            self._leased.update(ids + new_ids)
+        try:
+            envs = list(self._executor.map(lambda _: DeepmindLabEnv(scene, **kwargs), new_ids))
+        except Exception:
+            with self._lock:
+                for env_id in new_ids:
+                    del self._envs[env_id]
+                    del self._keys[env_id]
+                self._leased.difference_update(ids + new_ids)
+                self._idle.extend(ids)
+            raise
+        with self._lock:
+            self._envs.update(zip(new_ids, envs))
+        return ids + new_ids
+
+    def release(self, ids):
+        with self._lock:
+            for env_id in ids:
+                if env_id not in self._leased:
+                    continue
+                self._leased.remove(env_id)
+                if env_id in self._reported or len(self._idle) >= self.max_idle:
+                    self._close(env_id)
+                else:
+                    self._idle.append(env_id)
+
+    def _close(self, env_id):
+        env = self._envs.pop(env_id)
+        del self._keys[env_id]
+        self._reported.discard(env_id)
+        if env is not None:
+            env.close()
+
+    def envs(self, ids):
+        return [self._envs[env_id] for env_id in ids]
+
+    def map(self, function, *args):
+        return list(self._executor.map(function, *args))
+
+    def set_report_path(self, env_id, path, rank, **kwargs):
+        self._envs[env_id].set_report_path(path, rank, **kwargs)
+        self._reported.add(env_id)
+
+    def stats(self):
+        with self._lock:
+            return {'envs': len(self._envs), 'leased': len(self._leased), 'idle': len(self._idle),
+                    'max_envs': self.max_envs}
+
+    def close(self):
+        with self._lock:
+            for env_id in list(self._envs):
+                self._close(env_id)
+            self._leased.clear()
+            self._idle = []
+        self._executor.shutdown(wait=True)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def setup(self):
+        self.leased = set()
+        self.frames = None
+
+    def handle(self):
+        pool = self.server.pool
+        while True:
+            try:
+                request, _ = recv_message(self.request)
+            except (EOFError, ConnectionError):
+                return
+            try:
+                ids = request.get('ids', [])
+                if any(env_id not in self.leased for env_id in ids):
+                    raise Exception('Env %s is not leased by this connection' % ids)
+                header, payload = self._dispatch(pool, request, ids)
+            except Exception:
+                header, payload = {'error': traceback.format_exc()}, None
+            try:
+                send_message(self.request, header, payload)
+            except (BrokenPipeError, ConnectionError):
+                return
+            if request.get('op') == 'close':
+                return
+
+    def _frames(self, envs):
+        shape = (len(envs),) + envs[0].observation_space.shape
+        if self.frames is None or self.frames.shape != shape:
+            self.frames = np.empty(shape, dtype=np.uint8)
+        return self.frames
+
+    def _dispatch(self, pool, request, ids):
+        op = request['op']
+        if op == 'lease':
+            ids = pool.lease(request['scene'], request.get('kwargs', {}), request.get('count', 1))
+            self.leased.update(ids)
+            env = pool.envs(ids[:1])[0]
+            return {'ids': ids, 'shape': env.observation_space.shape}, None
+        envs = pool.envs(ids)
+        if op == 'step':
+            frames = self._frames(envs)
+            results = pool.map(lambda env, action: env.step(action), envs, request['actions'])
+            infos = []
+            for index, (obs, reward, done, info) in enumerate(results):
+                frames[index] = obs
+                infos.append(info)
+            return {'rewards': [float(result[1]) for result in results],
+                    'dones': [bool(result[2]) for result in results],
+                    'sound_status': [_status(info['sound_status']) for info in infos],
+                    'distractor_status': [_status(info['distractor_status']) for info in infos],
+                    'episode': [info.get('episode') for info in infos]}, frames
+        elif op == 'reset':
+            frames = self._frames(envs)
+            frames[:] = pool.map(lambda env: env.reset(), envs)
+            return {'sound_status': [_status(env.sound_on) for env in envs],
+                    'distractor_status': [_status(env.distractor_on) for env in envs]}, frames
+        elif op == 'seed':
+            return {'seeds': [env.seed(seed) for env, seed in zip(envs, request['seeds'])]}, None
+        elif op == 'set_report_path':
+            for env_id, rank in zip(ids, request['ranks']):
+                pool.set_report_path(env_id, request['path'], rank, **request.get('kwargs', {}))
+            return {}, None
+        elif op == 'release':
+            pool.release(ids)
+            self.leased.difference_update(ids)
+            return {}, None
+        elif op == 'stats':
+            return pool.stats(), None
+        elif op == 'close':
+            return {}, None
+        raise Exception('Unknown request %s' % op)
+
+    def finish(self):
+        # Leases end with the connection, also when the learner crashed.
+        self.server.pool.release(list(self.leased))
+        self.leased = set()
+
+
+def _remove_stale_socket(socket_path):
+    """Removes the socket a server that is gone left at socket_path.
+
+    Anything else at socket_path, including the socket of a running server,
+    is left alone and raises.
+    """
+    try:
+        mode = os.stat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise Exception('%s exists and is not a socket' % socket_path)
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except ConnectionRefusedError:
+        os.unlink(socket_path)
+        return
+    finally:
+        probe.close()
+    raise Exception('A server is already listening on %s' % socket_path)
+
+
+class EnvServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves an EnvPool on a Unix socket, with one thread per connection."""
+    daemon_threads = True
+
+    def __init__(self, socket_path, max_envs=16, max_idle=None, env_kwargs=None, threads=None):
+        _remove_stale_socket(socket_path)
+        self.socket_path = socket_path
+        self.pool = EnvPool(max_envs, max_idle, env_kwargs, threads)
+        socketserver.UnixStreamServer.__init__(self, socket_path, _Handler)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        self.pool.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class ServerConnection:
+    """One connection to an EnvServer; its leases end when it is closed."""
+
+    def __init__(self, socket_path):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(socket_path)
+        self.closed = False
+
+    def request(self, header, out=None):
+        send_message(self._sock, header)
+        response, payload = recv_message(self._sock, out)
+        if 'error' in response:
+            raise Exception('Server error:\n%s' % response['error'])
+        return response, payload
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.request({'op': 'close'})
+        except (EOFError, ConnectionError):
+            pass
+        self._sock.close()
+
+
+class DeepmindLabRemoteVectorEnv(gym.Env):
+    """Leases num_envs envs from an EnvServer and steps them with one request.
+
+    It behaves like DeepmindLabVectorEnv: reset() and step() return a
+    (num_envs, height, width, 3) frame array that is overwritten by the next
+    call, the sound_status and distractor_status infos are arrays that are
+    -1 while unknown, and the spaces describe the batch. kwargs are passed to
+    DeepmindLabEnv on the server.
+    """
+    metadata = DeepmindLabEnv.metadata
+
+    def __init__(self, scene, num_envs=4, socket_path=None, **kwargs):
+        super(DeepmindLabRemoteVectorEnv, self).__init__()
+        if socket_path is None:
+            socket_path = os.environ.get('GYM_DEEPMINDLAB_SERVER', '/tmp/gym_deepmindlab.sock')
+        self.num_envs = num_envs
+        self.closed = False
+        self._connection = ServerConnection(socket_path)
+        try:
+            response, _ = self._connection.request({'op': 'lease', 'scene': scene, 'kwargs': kwargs,
+                                                    'count': num_envs})
+        except Exception:
+            self._connection.close()
+            raise
+        self._ids = response['ids']
+        shape = tuple(response['shape'])
+        self._frames = np.empty((num_envs,) + shape, dtype=np.uint8)
+        self.single_action_space = gym.spaces.Discrete(len(ACTION_LIST))
+        self.single_observation_space = gym.spaces.Box(0, 255, shape, dtype=np.uint8)
+        self.action_space = gym.spaces.MultiDiscrete([len(ACTION_LIST)] * num_envs)
+        self.observation_space = gym.spaces.Box(0, 255, self._frames.shape, dtype=np.uint8)
+
+    def step(self, actions):
+        response, _ = self._connection.request({'op': 'step', 'ids': self._ids,
+                                                'actions': [int(action) for action in actions]}, self._frames)
+        infos = {'sound_status': np.array(response['sound_status'], dtype=np.int8),
+                 'distractor_status': np.array(response['distractor_status'], dtype=np.int8),
+                 'episode': response['episode']}
+        return (self._frames, np.array(response['rewards'], dtype=np.float64),
+                np.array(response['dones'], dtype=bool), infos)
+
+    def reset(self):
+        self._connection.request({'op': 'reset', 'ids': self._ids}, self._frames)
+        return self._frames
+
+    def seed(self, seed=None):
+        seeds = [None if seed is None else seed + index for index in range(self.num_envs)]
+        return self._connection.request({'op': 'seed', 'ids': self._ids, 'seeds': seeds})[0]['seeds']
+
+    def set_report_path(self, path, rank, **kwargs):
+        # Env i reports as rank + i; kwargs are passed to DeepmindLabEnv.set_report_path().
+        self._connection.request({'op': 'set_report_path', 'ids': self._ids, 'path': path,
+                                  'ranks': [rank + index for index in range(self.num_envs)], 'kwargs': kwargs})
+
+    def render(self, mode='rgb_array'):
+        if mode == 'rgb_array':
+            return self._frames.copy()
+        else:
+            super(DeepmindLabRemoteVectorEnv, self).render(mode=mode)  # just raise an exception
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._connection.close()
+
+    def get_action_meanings(self):
+        return english_names_of_actions
+
+
+class DeepmindLabRemoteEnv(gym.Env):
+    """A single env leased from an EnvServer, with the interface of DeepmindLabEnv."""
+    metadata = DeepmindLabEnv.metadata
+
+    def __init__(self, scene, socket_path=None, **kwargs):
+        super(DeepmindLabRemoteEnv, self).__init__()
+        self._vector = DeepmindLabRemoteVectorEnv(scene, 1, socket_path, **kwargs)
+        self.action_space = self._vector.single_action_space
+        self.observation_space = self._vector.single_observation_space
+
+    def step(self, action):
+        frames, rewards, dones, infos = self._vector.step([action])
+        info = {'sound_status': _remote_status(infos['sound_status'][0]),
+                'distractor_status': _remote_status(infos['distractor_status'][0])}
+        if infos['episode'][0] is not None:
+            info['episode'] = infos['episode'][0]
+        return frames[0], float(rewards[0]), bool(dones[0]), info
+
+    def reset(self):
+        return self._vector.reset()[0]
+
+    def seed(self, seed=None):
+        return self._vector.seed(seed)[0]
+
+    def set_report_path(self, path, rank, **kwargs):
+        self._vector.set_report_path(path, rank, **kwargs)
+
+    def render(self, mode='rgb_array'):
+        if mode == 'rgb_array':
+            return self._vector.render(mode)[0]
+        else:
+            super(DeepmindLabRemoteEnv, self).render(mode=mode)  # just raise an exception
+
+    def close(self):
+        self._vector.close()
+
+    def get_action_meanings(self):
+        return english_names_of_actions
+
+
+def _remote_status(value):
+    return None if value == STATUS_UNKNOWN else bool(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m gym_deepmindlab.server',
+                                     description='Serve DeepMind Lab environments over a Unix socket.')
+    parser.add_argument('--socket', default=os.environ.get('GYM_DEEPMINDLAB_SERVER', '/tmp/gym_deepmindlab.sock'))
+    parser.add_argument('--max-envs', type=int, default=16)
+    parser.add_argument('--max-idle', type=int, default=None)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--backend', default=None, help="'deepmind_lab' or 'fake'")
+    parser.add_argument('--level-cache-dir', default=None)
+    args = parser.parse_args(argv)
+
+    env_kwargs = {}
+    if args.backend is not None:
+        env_kwargs['backend'] = args.backend
+    if args.level_cache_dir is not None:
+        env_kwargs['level_cache_dir'] = args.level_cache_dir
+    server = EnvServer(args.socket, args.max_envs, args.max_idle, env_kwargs, args.threads)
+    print('Serving up to %d envs on %s' % (args.max_envs, args.socket))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,349 @@
+import numpy as np
+
+from .instr import COMMANDS, POSITION, PICKUP, INDICATION_STATUS, DOOR_STATUS, SET_REWARD, LOST_REWARD
+
+# Integer codes of the INSTR commands, used to index the dispatch tables.
+COMMAND_CODES = {command: code for code, command in enumerate(COMMANDS)}
+POSITION_CODE = COMMAND_CODES[POSITION]
+
+# Layout of the per-env task state. reset() copies the first RESET_SIZE
+# values from INITIAL_STATE in one slice assignment; the distractor and
+# reward times are kept across resets.
+FIELDS = ('episode', 'position', 'sound_on', 'distractor_on',
+          'rat_left_base_during_reward_time', 'rat_left_during_distractor',
+          'missed_counter', 'early_counter', 'late_counter', 'correct_counter',
+          'distractor_counter', 'correct_distractor_counter',
+          'distractor_start_time', 'distractor_stop_time', 'reward_start_time', 'reward_stop_time')
+(EPISODE, POSITION_FIELD, SOUND_ON, DISTRACTOR_ON, LEFT_DURING_REWARD, LEFT_DURING_DISTRACTOR,
+ MISSED, EARLY, LATE, CORRECT, DISTRACTED, DIST_OK,
+ DISTRACTOR_START, DISTRACTOR_STOP, REWARD_START, REWARD_STOP) = range(len(FIELDS))
+RESET_SIZE = DISTRACTOR_START
+INITIAL_STATE = (0, "base1", None, None, False, False, 0, 0, 0, 0, 0, 0, 0, -5, 0, 0)
+
+COLUMN_FIELDS = {'missed': MISSED, 'early': EARLY, 'late': LATE,
+                 'distracted': DISTRACTED, 'dist.OK': DIST_OK, 'correct': CORRECT}
+
+
+def time_in_seconds(time):
+    return (int(time) % 3600) % 60
+
+
+def _raw(value):
+    return value
+
+
+def _position_change(state, event):
+    return state[POSITION_FIELD], event.string1
+
+
+def _status(state, event):
+    return event.string1
+
+
+def _any(state, event):
+    return None
+
+
+class Rule:
+    """How one INSTR command is handled by a task.
+
+    episode and time convert the Num1 and Num2 options, key maps the state
+    and the event to a key of handlers, and the handler found under that key
+    is called as handler(task, state, event, time).
+    """
+
+    def __init__(self, handlers, key=_any, episode=int, time=_raw):
+        self.handlers = handlers
+        self.key = key
+        self.episode = episode
+        self.time = time
+
+
+class TaskTable:
+    """Declarative description of a task family: its report columns and a Rule per command."""
+
+    def __init__(self, family, columns, rules):
+        self.family = family
+        self.columns = tuple(columns)
+        self.counter_fields = tuple(COLUMN_FIELDS[column] for column in self.columns)
+        self.dispatch = [None] * len(COMMANDS)
+        for command, rule in rules.items():
+            self.dispatch[COMMAND_CODES[command]] = rule
+
+
+# Sound task
+
+def _sound_left_base(task, s, event, time):
+    task.write_to_file("not_in_base", time)
+    if s[SOUND_ON]:
+        s[LEFT_DURING_REWARD] = True
+        task.write_to_file("rat_left_base_during_reward_time", time)
+    elif s[DISTRACTOR_ON] or \
+            (s[DISTRACTOR_STOP] - s[DISTRACTOR_START] < 5 and s[DISTRACTOR_STOP] >= s[DISTRACTOR_START]):
+        s[DISTRACTED] += 1
+        s[LEFT_DURING_DISTRACTOR] = True
+        task.write_to_file("rat_left_during_distractor", time)
+        s[DISTRACTOR_STOP] = (s[DISTRACTOR_START] + 5) % 60
+    else:
+        s[EARLY] += 1
+        task.write_to_file("left_early", time)
+
+
+def _in_base(task, s, event, time):
+    task.write_to_file("in_base", time)
+
+
+def _sound_pickup(task, s, event, time):
+    s[CORRECT] += 1
+    s[LATE] -= 1
+    task.write_to_file("correct_trial", time)
+
+
+def _sound_on(task, s, event, time):
+    s[SOUND_ON] = True
+    task.write_to_file("reward_time_started", time)
+
+
+def _sound_off(task, s, event, time):
+    s[SOUND_ON] = False
+    if s[LEFT_DURING_REWARD]:
+        s[LATE] += 1
+        s[LEFT_DURING_REWARD] = False
+        task.write_to_file("correct_or_late", time)
+    elif s[POSITION_FIELD] == "base1":
+        s[MISSED] += 1
+        task.write_to_file("missed_trial", time)
+
+
+def _distractor_on(task, s, event, time):
+    s[DISTRACTOR_ON] = True
+    s[LEFT_DURING_DISTRACTOR] = False
+    s[DISTRACTOR_START] = time_in_seconds(time)
+    task.write_to_file("distractor_time_started", time)
+
+
+def _distractor_off(task, s, event, time):
+    s[DISTRACTOR_ON] = False
+    s[DISTRACTOR_STOP] = time_in_seconds(time)
+    if not s[LEFT_DURING_DISTRACTOR] and s[DISTRACTOR_STOP] - s[DISTRACTOR_START] >= 5:
+        s[DIST_OK] += 1
+        task.write_to_file("distractor_avoided", time)
+
+
+SOUND = TaskTable('sound', ('missed', 'early', 'late', 'distracted', 'dist.OK', 'correct'), {
+    POSITION: Rule({("base1", "corridor"): _sound_left_base,
+                    ("corridor", "base1"): _in_base}, key=_position_change),
+    PICKUP: Rule({None: _sound_pickup}),
+    INDICATION_STATUS: Rule({"sound_on": _sound_on,
+                             "sound_off": _sound_off,
+                             "distractor_on": _distractor_on,
+                             "distractor_off": _distractor_off}, key=_status, episode=_raw),
+})
+
+
+# Nose poke task
+
+def _nose_poke_left_base(task, s, event, time):
+    task.write_to_file("not_in_base", time)
+    if s[SOUND_ON]:
+        s[LEFT_DURING_REWARD] = True
+        task.write_to_file("rat_left_base_during_reward_time", time)
+    elif s[DISTRACTOR_ON]:
+        s[DISTRACTED] += 1
+        s[LEFT_DURING_DISTRACTOR] = True
+        task.write_to_file("rat_left_during_distractor", time)
+    else:
+        s[EARLY] += 1
+        task.write_to_file("left_early", time)
+
+
+def _nose_poke_pickup(task, s, event, time):
+    s[CORRECT] += 1
+    task.write_to_file("correct_trial", time)
+
+
+def _nose_poke_sound_on(task, s, event, time):
+    s[SOUND_ON] = True
+    s[LEFT_DURING_REWARD] = False
+    s[REWARD_START] = time_in_seconds(time)
+    task.write_to_file("reward_time_started", time)
+
+
+def _nose_poke_sound_off(task, s, event, time):
+    s[SOUND_ON] = False
+    s[REWARD_STOP] = time_in_seconds(time)
+    if s[LEFT_DURING_REWARD]:
+        s[LEFT_DURING_REWARD] = False
+    elif s[REWARD_STOP] - s[REWARD_START] >= 5:
+        s[MISSED] += 1
+        task.write_to_file("missed_trial", time)
+
+
+NOSE_POKE = TaskTable('nose_poke', ('missed', 'early', 'distracted', 'dist.OK', 'correct'), {
+    POSITION: Rule({("base1", "nose_poke"): _nose_poke_left_base,
+                    ("nose_poke", "base1"): _in_base}, key=_position_change),
+    PICKUP: Rule({None: _nose_poke_pickup}),
+    INDICATION_STATUS: Rule({"sound_on": _nose_poke_sound_on,
+                             "sound_off": _nose_poke_sound_off,
+                             "distractor_on": _distractor_on,
+                             "distractor_off": _distractor_off}, key=_status, episode=_raw),
+})
+
+
+# Memory task
+
+def _memory_position(task, s, event, time):
+    task.write_to_file(event.string1, time)
+
+
+def _memory_pickup(task, s, event, time):
+    s[CORRECT] += 1
+    task.write_to_file("Picked up " + event.string1, time)
+
+
+def _memory_door(task, s, event, time):
+    task.write_to_file(event.string1 + ' ' + event.string2, time)
+
+
+def _memory_set_reward(task, s, event, time):
+    task.write_to_file("Set reward " + event.string1, time)
+
+
+def _memory_lost_reward(task, s, event, time):
+    task.write_to_file("Lost reward " + event.string1, time)
+
+
+MEMORY = TaskTable('memory', ('missed', 'correct'), {
+    POSITION: Rule({None: _memory_position}, time=int),
+    PICKUP: Rule({None: _memory_pickup}, time=int),
+    DOOR_STATUS: Rule({None: _memory_door}, time=int),
+    SET_REWARD: Rule({None: _memory_set_reward}, time=int),
+    LOST_REWARD: Rule({None: _memory_lost_reward}, time=int),
+})
+
+NO_TASK = TaskTable(None, (), {})
+
+TABLES = {}
+_MATCHERS = []
+
+
+def register_task(table, match=None):
+    """Registers a task table; match(scene) selects it for the scenes it returns True for."""
+    TABLES[table.family] = table
+    if match is not None:
+        _MATCHERS.append((match, table.family))
+
+
+register_task(SOUND, lambda scene: "Sound" in scene or "sound" in scene)
+register_task(NOSE_POKE, lambda scene: "nose" in scene or "Nose" in scene)
+register_task(MEMORY, lambda scene: "Memory" in scene or "memory" in scene)
+
+
+def task_family(scene):
+    for match, family in _MATCHERS:
+        if match(scene):
+            return family
+    return None
+
+
+def _field(index):
+    def get(self):
+        return self.state[index]
+
+    def set(self, value):
+        self.state[index] = value
+    return property(get, set)
+
+
+class Task:
+    """Scores the INSTR events of a level according to its TaskTable.
+
+    Events are only processed while a report writer is attached, as
+    DeepmindLabEnv only scores episodes when set_report_path() was called.
+    The state is a flat list laid out as FIELDS; the fields can also be read
+    and written as attributes of the task.
+    """
+
+    def __init__(self, table=NO_TASK):
+        self.table = table
+        self.family = table.family
+        self.columns = table.columns
+        self.report = None
+        self.state = list(INITIAL_STATE)
+
+    def reset(self):
+        """Starts a new Lab episode; the counters and the episode number restart at 0."""
+        if self.report is not None:
+            self.report.end_lab_episode()
+        self.state[:RESET_SIZE] = INITIAL_STATE[:RESET_SIZE]
+
+    def counters(self):
+        state = self.state
+        return tuple(state[field] for field in self.table.counter_fields)
+
+    def write_to_file(self, type_event, seconds):
+        self.report.write_event(self.state[EPISODE], type_event, seconds, self.counters())
+
+    def process_command(self, events):
+        if self.report is None:
+            return
+        state = self.state
+        dispatch = self.table.dispatch
+        for event in events:
+            code = COMMAND_CODES.get(event.command)
+            rule = dispatch[code] if code is not None else None
+            if rule is None:
+                continue
+            state[EPISODE] = rule.episode(event.num1)
+            time = rule.time(event.num2)
+            handler = rule.handlers.get(rule.key(state, event))
+            if handler is not None:
+                handler(self, state, event, time)
+            if code == POSITION_CODE:
+                state[POSITION_FIELD] = event.string1
+
+
+for _index, _name in enumerate(FIELDS):
+    setattr(Task, _name, _field(_index))
+
+
+def make_task(family):
+    return Task(TABLES.get(family, NO_TASK))
+
+
+# Batched layout of the task state, one record per env. Positions are stored
+# as UTF-8 strings of up to POSITION_BYTES bytes, so records can be decoded in
+# any process, and unknown statuses (None) as -1.
+POSITION_BYTES = 32
+STATE_DTYPE = np.dtype([(name, 'S%d' % POSITION_BYTES if name == 'position' else '<f8') for name in FIELDS])
+
+
+def pack_states(tasks, out=None):
+    """Copies the states of many tasks into a STATE_DTYPE array."""
+    if out is None:
+        out = np.zeros(len(tasks), dtype=STATE_DTYPE)
+    for index, task in enumerate(tasks):
+        state = list(task.state)
+        position = state[POSITION_FIELD].encode()
+        if len(position) > POSITION_BYTES:
+            raise ValueError('position %r is longer than %d bytes' % (state[POSITION_FIELD], POSITION_BYTES))
+        state[POSITION_FIELD] = position
+        state[SOUND_ON] = -1 if state[SOUND_ON] is None else state[SOUND_ON]
+        state[DISTRACTOR_ON] = -1 if state[DISTRACTOR_ON] is None else state[DISTRACTOR_ON]
+        out[index] = tuple(state)
+    return out
+
+
+def unpack_state(record, task):
+    """Restores the state of a task from one STATE_DTYPE record."""
+    state = [record[name].item() for name in FIELDS]
+    state[POSITION_FIELD] = state[POSITION_FIELD].decode()
+    for index in (SOUND_ON, DISTRACTOR_ON):
+        state[index] = None if state[index] < 0 else bool(state[index])
+    for index in (LEFT_DURING_REWARD, LEFT_DURING_DISTRACTOR):
+        state[index] = bool(state[index])
+    for index in (EPISODE, MISSED, EARLY, LATE, CORRECT, DISTRACTED, DIST_OK,
+                  DISTRACTOR_START, DISTRACTOR_STOP, REWARD_START, REWARD_STOP):
+        if state[index].is_integer():
+            state[index] = int(state[index])
+    task.state[:] = state
@@ -0,0 +1,205 @@
+import asyncio
+import multiprocessing
+import traceback
+
+import gym
+import numpy as np
+
+from .env import DeepmindLabEnv, ACTION_LIST, english_names_of_actions
+
+# sound_status and distractor_status are None until the level reports them.
+STATUS_UNKNOWN = -1
+
+
+def _status(value):
+    return STATUS_UNKNOWN if value is None else int(value)
+
+
+def _views(num_envs, height, width, frames, actions, rewards, dones, sound, distractor):
+    return (np.frombuffer(frames, dtype=np.uint8).reshape(num_envs, height, width, 3),
+            np.frombuffer(actions, dtype=np.int32),
+            np.frombuffer(rewards, dtype=np.float64),
+            np.frombuffer(dones, dtype=np.uint8),
+            np.frombuffer(sound, dtype=np.int8),
+            np.frombuffer(distractor, dtype=np.int8))
+
+
+def _worker(index, num_envs, scene, kwargs, shared, pipe, parent_pipe):
+    parent_pipe.close()
+    env = None
+    try:
+        frames, actions, rewards, dones, sound, distractor = _views(num_envs, kwargs['height'], kwargs['width'],
+                                                                    *shared)
+        # The env renders straight into this worker's slot of the shared array.
+        env = DeepmindLabEnv(scene, obs_buffer=frames[index], **kwargs)
+        pipe.send((True, None))
+        while True:
+            command, data = pipe.recv()
+            if command == 'step':
+                _, reward, done, info = env.step(int(actions[index]))
+                rewards[index] = reward
+                dones[index] = done
+                sound[index] = _status(info['sound_status'])
+                distractor[index] = _status(info['distractor_status'])
+                pipe.send((True, info.get('episode')))
+            elif command == 'reset':
+                env.reset()
+                sound[index] = _status(env.sound_on)
+                distractor[index] = _status(env.distractor_on)
+                pipe.send((True, None))
+            elif command == 'seed':
+                pipe.send((True, env.seed(data)))
+            elif command == 'set_report_path':
+                pipe.send((True, env.set_report_path(*data[0], **data[1])))
+            elif command == 'close':
+                pipe.send((True, None))
+                break
+            else:
+                raise ValueError('Unknown command %s' % command)
+    except (KeyboardInterrupt, EOFError):
+        pass
+    except Exception:
+        pipe.send((False, traceback.format_exc()))
+    finally:
+        if env is not None:
+            env.close()
+        pipe.close()
+
+
+class DeepmindLabVectorEnv(gym.Env):
+    """Runs num_envs DeepmindLabEnv instances in worker processes.
+
+    Every worker writes its frames straight into a shared (num_envs, height, width, 3)
+    uint8 array. reset() and step() return that array without copying it, so it is
+    overwritten by the next call. Rewards, dones and the sound_status and
+    distractor_status infos come back as arrays; the statuses are -1 while unknown.
+    Episodes restart automatically exactly as in DeepmindLabEnv.step().
+
+    observation_space and action_space describe the batch, a (num_envs, height,
+    width, 3) Box and a MultiDiscrete with one action per env;
+    single_observation_space and single_action_space describe one env.
+
+    step_async() starts a step in all workers and returns immediately;
+    step_wait() collects the results. astep() is the asyncio equivalent.
+    """
+    metadata = DeepmindLabEnv.metadata
+
+    def __init__(self, scene, num_envs=4, width=84, height=84, context=None, **kwargs):
+        super(DeepmindLabVectorEnv, self).__init__()
+        if kwargs.get('colors', 'RGB_INTERLEAVED') != 'RGB_INTERLEAVED':
+            raise Exception('DeepmindLabVectorEnv only supports RGB_INTERLEAVED observations')
+
+        self.num_envs = num_envs
+        self.single_action_space = gym.spaces.Discrete(len(ACTION_LIST))
+        self.single_observation_space = gym.spaces.Box(0, 255, (height, width, 3), dtype=np.uint8)
+        self.action_space = gym.spaces.MultiDiscrete([len(ACTION_LIST)] * num_envs)
+        self.observation_space = gym.spaces.Box(0, 255, (num_envs, height, width, 3), dtype=np.uint8)
+
+        ctx = multiprocessing.get_context(context)
+        shared = (ctx.RawArray('B', num_envs * height * width * 3),
+                  ctx.RawArray('i', num_envs),
+                  ctx.RawArray('d', num_envs),
+                  ctx.RawArray('B', num_envs),
+                  ctx.RawArray('b', num_envs),
+                  ctx.RawArray('b', num_envs))
+        self._frames, self._actions, self._rewards, self._dones, self._sound, self._distractor = \
+            _views(num_envs, height, width, *shared)
+
+        kwargs = dict(kwargs, width=width, height=height)
+        self._pipes = []
+        self._processes = []
+        self.closed = False
+        self._waiting = False
+        for index in range(num_envs):
+            pipe, worker_pipe = ctx.Pipe()
+            process = ctx.Process(target=_worker, name='DeepmindLabVectorEnv-%d' % index,
+                                  args=(index, num_envs, scene, kwargs, shared, worker_pipe, pipe), daemon=True)
+            process.start()
+            worker_pipe.close()
+            self._pipes.append(pipe)
+            self._processes.append(process)
+        self._receive_all()
+
+    def _receive_all(self):
+        results = []
+        errors = []
+        for index, pipe in enumerate(self._pipes):
+            success, result = pipe.recv()
+            if not success:
+                errors.append('Worker %d failed:\n%s' % (index, result))
+            results.append(result)
+        if errors:
+            self.close()
+            raise RuntimeError('\n'.join(errors))
+        return results
+
+    def _send_all(self, command, data=None):
+        for pipe in self._pipes:
+            pipe.send((command, data))
+
+    def step_async(self, actions):
+        if self._waiting:
+            raise Exception('step_async() called again before step_wait()')
+        self._actions[:] = actions
+        self._send_all('step')
+        self._waiting = True
+
+    def step_wait(self):
+        if not self._waiting:
+            raise Exception('step_wait() called without step_async()')
+        self._waiting = False
+        episodes = self._receive_all()
+        infos = {'sound_status': self._sound.copy(),
+                 'distractor_status': self._distractor.copy(),
+                 'episode': episodes}
+        return self._frames, self._rewards.copy(), self._dones.astype(bool), infos
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    async def astep(self, actions):
+        self.step_async(actions)
+        return await asyncio.get_running_loop().run_in_executor(None, self.step_wait)
+
+    def reset(self):
+        if self._waiting:
+            self.step_wait()
+        self._send_all('reset')
+        self._receive_all()
+        return self._frames
+
+    def seed(self, seed=None):
+        for index, pipe in enumerate(self._pipes):
+            pipe.send(('seed', None if seed is None else seed + index))
+        return self._receive_all()
+
+    def set_report_path(self, path, rank, **kwargs):
+        # Worker i reports as rank + i.
+        for index, pipe in enumerate(self._pipes):
+            pipe.send(('set_report_path', ((path, rank + index), kwargs)))
+        self._receive_all()
+
+    def render(self, mode='rgb_array'):
+        if mode == 'rgb_array':
+            return self._frames.copy()
+        else:
+            super(DeepmindLabVectorEnv, self).render(mode=mode)  # just raise an exception
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for pipe, process in zip(self._pipes, self._processes):
+            if process.is_alive():
+                try:
+                    pipe.send(('close', None))
+                    pipe.recv()
+                except (BrokenPipeError, EOFError):
+                    pass
+            pipe.close()
+        for process in self._processes:
+            process.join()
+
+    def get_action_meanings(self):
+        return english_names_of_actions
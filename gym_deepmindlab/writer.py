@@ -0,0 +1,177 @@
+import atexit
+import csv
+import os
+import queue
+import threading
+import weakref
+
+BLOCK = 'block'
+DROP = 'drop'
+RAISE = 'raise'
+
+ON_FULL_POLICIES = (BLOCK, DROP, RAISE)
+
+_FLUSH = object()
+_CLOSE = object()
+
+
+class ReportQueueFull(Exception):
+    pass
+
+
+def format_time_stamp(episode, seconds):
+    seconds = int(seconds)
+    h = str(seconds // 3600)
+    m = str((seconds % 3600) // 60)
+    s = str((seconds % 3600) % 60)
+    return str(episode) + "_" + h + ":" + m + ":" + s
+
+
+# The open report writers and recorders, which add themselves on opening
+# and are closed at exit by a single hook. The set does not keep them alive.
+_open_writers = weakref.WeakSet()
+
+
+def _close_open_writers():
+    for writer in list(_open_writers):
+        writer.close()
+
+
+atexit.register(_close_open_writers)
+
+
+class CsvReportWriter:
+    """Writes report rows to rat{rank}_{episode}.csv files from a background thread.
+
+    Rows are queued by write_event() and drained in batches by a single worker
+    thread, so they reach every file in the order they were queued. The file of
+    each episode is kept open until flush(close_files=True) or close().
+    """
+
+    def __init__(self, path, rank, columns, queue_size=10000, on_full=BLOCK, batch_size=256):
+        if on_full not in ON_FULL_POLICIES:
+            raise ValueError('on_full must be one of %s, got %r' % (', '.join(ON_FULL_POLICIES), on_full))
+        self.path = path
+        self.rank = rank
+        self.header = ['time_stamp', 'event'] + list(columns)
+        self.on_full = on_full
+        self.batch_size = batch_size
+        self.dropped = 0
+        self.error = None
+
+        self._files = {}
+        self._closed = False
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name='report-writer-%s' % rank, daemon=True)
+        self._thread.start()
+        _open_writers.add(self)
+
+    def csv_name(self, episode):
+        return str(self.path) + '/rat' + str(self.rank) + '_' + str(episode) + '.csv'
+
+    def write_event(self, episode, type_event, seconds, counters):
+        if self._closed:
+            raise ValueError('write to a closed report writer')
+        item = (episode, type_event, seconds, counters)
+        if self.on_full == BLOCK:
+            self._queue.put(item)
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            if self.on_full == RAISE:
+                raise ReportQueueFull('report queue for rank %s is full (%d rows)' % (self.rank, self._queue.maxsize))
+            self.dropped += 1
+
+    def end_lab_episode(self):
+        # The CSV layout has no Lab episode; the rows of all Lab episodes are
+        # appended to the files of their episode numbers.
+        pass
+
+    def flush(self, close_files=False, wait=True):
+        if self._closed:
+            return
+        if not wait:
+            if self.on_full == BLOCK:
+                self._queue.put((_FLUSH, close_files, None))
+                return
+            try:
+                self._queue.put_nowait((_FLUSH, close_files, None))
+            except queue.Full:
+                # Like the rows, the marker does not hold up the caller. The
+                # rows already queued still reach their files, which the next
+                # marker or close() flushes and closes.
+                pass
+            return
+        done = threading.Event()
+        self._queue.put((_FLUSH, close_files, done))
+        done.wait()
+        self._raise_error()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        _open_writers.discard(self)
+        self._queue.put((_CLOSE, True, None))
+        self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _open(self, episode):
+        csv_name = self.csv_name(episode)
+        new_file = not os.path.exists(csv_name)
+        fd = open(csv_name, 'a', newline='')
+        writer = csv.writer(fd)
+        if new_file:
+            writer.writerow(self.header)
+        self._files[episode] = (fd, writer)
+        return writer
+
+    def _close_files(self):
+        for fd, _ in self._files.values():
+            fd.close()
+        self._files.clear()
+
+    def _write_batch(self, batch):
+        for episode, type_event, seconds, counters in batch:
+            entry = self._files.get(episode)
+            writer = entry[1] if entry is not None else self._open(episode)
+            writer.writerow([format_time_stamp(episode, seconds), type_event] + list(counters))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = []
+            while item[0] is not _FLUSH and item[0] is not _CLOSE:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    item = None
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+                    break
+            try:
+                if batch:
+                    self._write_batch(batch)
+                if item is not None:
+                    if item[1]:
+                        self._close_files()
+                    else:
+                        for fd, _ in self._files.values():
+                            fd.flush()
+            except OSError as e:
+                self.error = e
+            if item is None:
+                continue
+            marker, _, done = item
+            if done is not None:
+                done.set()
+            if marker is _CLOSE:
+                return
@@ -0,0 +1,15 @@
+import os
+
+import pytest
+
+from helpers import TASK_SCENES, GOLDEN_PATH, read_files
+
+
+@pytest.fixture(params=TASK_SCENES)
+def scene(request):
+    return request.param
+
+
+@pytest.fixture
+def golden(scene):
+    return read_files(os.path.join(GOLDEN_PATH, scene))
@@ -0,0 +1,52 @@
+"""Helpers shared by the tests; the fixtures are in conftest.py."""
+import functools
+import os
+
+from gym_deepmindlab.env import DeepmindLabEnv
+from gym_deepmindlab.fake_lab import FakeLab
+from gym_deepmindlab.multilevel import DeepmindLabMultiLevelEnv
+
+TASK_SCENES = ('sound_task_zero', 'nose_poke_zero', 'memory_task_zero')
+
+# The golden reports were written by the original DeepmindLabEnv, before the
+# task logic was refactored, running on FakeLab with SHORT_LAB: two Lab
+# episodes of 60 seconds with task episodes of 25 seconds, plus 10 steps into
+# a third Lab episode.
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), 'data', 'golden')
+SHORT_LAB = functools.partial(FakeLab, episode_seconds=60, task_episode_seconds=25)
+GOLDEN_STEPS = 2 * 60 * 60 + 10
+
+HEADERS = {'sound': ['time_stamp', 'event', 'missed', 'early', 'late', 'distracted', 'dist.OK', 'correct'],
+           'memory': ['time_stamp', 'event', 'missed', 'correct']}
+
+
+def make_env(scene, **kwargs):
+    return DeepmindLabEnv(scene, width=4, height=4, backend=kwargs.pop('backend', SHORT_LAB), **kwargs)
+
+
+def run_env(scene, path, rank=0, steps=GOLDEN_STEPS, env_kwargs=None, **report_kwargs):
+    """Steps a fresh env of scene with a report in path, as the golden reports were written."""
+    env = make_env(scene, **(env_kwargs or {}))
+    env.set_report_path(str(path), rank, **report_kwargs)
+    env.reset()
+    for i in range(steps):
+        env.step(i % 4)
+    env.close()
+    return env
+
+
+def run_switches(path, **report_kwargs):
+    """Switches a multi-level env between the sound and the memory task twice, reporting to path."""
+    env = DeepmindLabMultiLevelEnv(['sound_task_zero', 'memory_task_zero'], max_warm=2, backend=SHORT_LAB,
+                                   width=4, height=4)
+    env.set_report_path(str(path), 0, **report_kwargs)
+    for scene in ('sound_task_zero', 'memory_task_zero', 'sound_task_zero', 'memory_task_zero'):
+        env.reset(scene=scene)
+        for i in range(2000):
+            env.step(i % 4)
+    env.close()
+
+
+def read_files(path):
+    """Returns the contents of every file in path by name."""
+    return {name: open(os.path.join(str(path), name), 'rb').read() for name in sorted(os.listdir(str(path)))}
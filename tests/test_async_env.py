@@ -0,0 +1,47 @@
+import concurrent.futures
+import threading
+
+import pytest
+
+from gym_deepmindlab.async_env import AsyncDeepmindLabEnv
+
+from helpers import make_env
+
+
+def test_failed_step_can_be_followed_by_another(monkeypatch):
+    env = AsyncDeepmindLabEnv(make_env('sound_task_zero'))
+    try:
+        env.reset()
+        step = env.env.step
+
+        def failing_step(action):
+            raise RuntimeError('step failed')
+
+        monkeypatch.setattr(env.env, 'step', failing_step)
+        env.step_async(0)
+        with pytest.raises(RuntimeError):
+            env.step_wait()
+        monkeypatch.setattr(env.env, 'step', step)
+        obs, reward, done, info = env.step(0)
+        assert obs.shape == (4, 4, 3)
+    finally:
+        env.close()
+
+
+def test_timeout_keeps_the_step_pending(monkeypatch):
+    env = AsyncDeepmindLabEnv(make_env('sound_task_zero'))
+    release = threading.Event()
+    step = env.env.step
+    monkeypatch.setattr(env.env, 'step', lambda action: release.wait() and step(action))
+    try:
+        env.reset()
+        env.step_async(0)
+        with pytest.raises(concurrent.futures.TimeoutError):
+            env.step_wait(timeout=0.01)
+        with pytest.raises(Exception, match='before step_wait'):
+            env.step_async(0)
+        release.set()
+        assert env.step_wait()[0].shape == (4, 4, 3)
+    finally:
+        release.set()
+        env.close()
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from gym_deepmindlab.dataset import TrajectoryRecorder, TrajectoryDataset
+
+from helpers import make_env
+
+
+def marker(frames):
+    # FakeLab writes the frame number modulo 256 into the first pixel.
+    return frames[..., 0, 0, 0].astype(np.int64)
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    env = TrajectoryRecorder(make_env('sound_task_zero'), str(tmp_path), chunk_size=1000)
+    env.reset()
+    # Two task episodes end with done, then the Lab episode ends and restarts.
+    for i in range(3700):
+        env.step(i % 4)
+    env.reset()
+    for i in range(10):
+        env.step(i % 4)
+    env.close()
+    return TrajectoryDataset(str(tmp_path))
+
+
+def test_next_obs_follows_the_transition(dataset):
+    indices = np.arange(len(dataset))
+    batch = dataset.get(indices)
+    assert np.array_equal(batch['obs'][:, 0], dataset.frames(indices))
+    ends = dataset.episode_ends[dataset.episode(indices)]
+    inside = indices + 1 < ends
+    assert np.array_equal(batch['next_obs'][inside, 0], dataset.frames(indices[inside] + 1))
+    # Only the last step of the Lab episode, which returns the previous frame, does not advance it.
+    advances = marker(batch['next_obs'][:, 0]) == (marker(batch['obs'][:, 0]) + 1) % 256
+    assert np.flatnonzero(~advances).tolist() == [3598]
+    assert dataset.episode_ends.tolist() == [1499, 2999, 3599, 3699, 3709]
+
+
+def test_frame_stacks_stay_in_the_episode(dataset):
+    batch = dataset.get([1499, 3709 - 1], frame_stack=3)
+    assert batch['obs'].shape == batch['next_obs'].shape == (2, 3, 4, 4, 3)
+    assert np.array_equal(batch['obs'][0, 0], batch['obs'][0, 2])
+    assert np.array_equal(batch['next_obs'][0, 1], batch['obs'][0, 2])
+
+
+@pytest.mark.parametrize('rng', [None, np.random.RandomState(0), np.random.default_rng(0)])
+def test_sample(dataset, rng):
+    batch = dataset.sample(16, frame_stack=2, rng=rng)
+    assert batch['obs'].shape == batch['next_obs'].shape == (16, 2, 4, 4, 3)
+    assert np.all((batch['index'] >= 0) & (batch['index'] < len(dataset)))
+
+
+def test_recording_without_episodes(tmp_path):
+    env = TrajectoryRecorder(make_env('sound_task_zero'), str(tmp_path))
+    env.reset()
+    env.close()
+    dataset = TrajectoryDataset(str(tmp_path))
+    with pytest.raises(Exception, match='no complete episode'):
+        dataset.sample(4)
+    with pytest.raises(IndexError):
+        dataset.episode_start([0])
@@ -0,0 +1,35 @@
+import functools
+
+import pytest
+
+from gym_deepmindlab.fake_lab import FakeLab
+
+from helpers import make_env, run_env, read_files
+
+# The level replaces its INSTR commands every frame.
+REPLACING_LAB = functools.partial(FakeLab, episode_seconds=60, task_episode_seconds=25, queue_instr=False)
+# Steps that cover the same frames as GOLDEN_STEPS with frame_skip=4: a Lab
+# episode is 900 steps and one restarting step.
+FRAME_SKIP_STEPS = 2 * (900 + 1) + 3
+
+
+def test_frame_skip_with_report_reads_every_frame(tmp_path, scene, golden):
+    env = run_env(scene, tmp_path, steps=FRAME_SKIP_STEPS, env_kwargs=dict(frame_skip=4, backend=REPLACING_LAB))
+    assert read_files(tmp_path) == golden
+    assert env.truncated_steps == 2
+
+
+def test_frame_skip_with_instrumentation_matches_golden(tmp_path, scene, golden):
+    env = run_env(scene, tmp_path, steps=FRAME_SKIP_STEPS, env_kwargs=dict(frame_skip=4, instrument=True))
+    assert read_files(tmp_path) == golden
+    assert env.truncated_steps == 2
+
+
+@pytest.mark.parametrize('frame_skip', [1, 3, 4])
+def test_frame_skip_without_report_sees_every_episode_end(scene, frame_skip):
+    env = make_env(scene, frame_skip=frame_skip, backend=REPLACING_LAB)
+    env.reset()
+    # One Lab episode of 60 seconds holds two task episodes of 25 seconds.
+    dones = sum(env.step(i % 4)[2] for i in range(60 * 60 // frame_skip))
+    env.close()
+    assert dones == 2
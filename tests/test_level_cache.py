@@ -0,0 +1,29 @@
+import os
+
+from gym_deepmindlab.level_cache import LevelCache, LOCK_DIR, LOCK_STRIPES
+
+from helpers import make_env
+
+
+def test_random_maps_keep_the_cache_bounded(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    env = make_env('nav_maze_random_goal_01', level_cache_dir=cache_dir, level_cache_size=5000)
+    for _ in range(200):
+        env.reset()
+    env.close()
+    cache = env.level_cache
+    assert cache.size() <= 5000
+    assert cache.evictions > 0
+    assert len(os.listdir(os.path.join(cache_dir, LOCK_DIR))) <= LOCK_STRIPES + 1
+
+
+def test_fetch_after_write(tmp_path):
+    cache = LevelCache(str(tmp_path / 'cache'))
+    source = tmp_path / 'map.pk3'
+    source.write_bytes(b'map')
+    cache.write('map.pk3', str(source))
+    target = tmp_path / 'fetched.pk3'
+    assert cache.fetch('map.pk3', str(target))
+    assert target.read_bytes() == b'map'
+    assert not cache.fetch('other.pk3', str(target))
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'writes': 1, 'evictions': 0}
@@ -0,0 +1,48 @@
+import csv
+import glob
+import os
+
+from gym_deepmindlab.monitor import read_stats, stats_name
+
+from helpers import HEADERS, make_env, run_switches
+
+
+def correct_trials(path):
+    count = 0
+    for name in glob.glob(os.path.join(str(path), '*.csv')):
+        with open(name, newline='') as f:
+            count += sum(row[1] == 'correct_trial' or row[1].startswith('Picked up') for row in csv.reader(f))
+    return count
+
+
+def total_correct(path):
+    record, _ = read_stats(stats_name(path, 0))
+    return int(record['total_counters'][-1])
+
+
+def test_setting_the_report_path_again_keeps_the_totals(tmp_path):
+    env = make_env('sound_task_zero')
+    env.set_report_path(str(tmp_path), 0, live_stats=True)
+    env.reset()
+    for i in range(1500):
+        env.step(i % 4)
+    env.set_report_path(str(tmp_path), 0, live_stats=True)
+    for i in range(1500):
+        env.step(i % 4)
+    env.reset()
+    env.close()
+    record, _ = read_stats(stats_name(tmp_path, 0))
+    assert total_correct(tmp_path) == correct_trials(tmp_path) > 0
+    assert record['steps'] == 3000
+    assert record['task_episodes'] == 2
+    assert record['lab_episodes'] == 1
+
+
+def test_switching_levels_keeps_the_totals(tmp_path):
+    run_switches(tmp_path, live_stats=True)
+    for family in HEADERS:
+        path = os.path.join(str(tmp_path), family)
+        record, _ = read_stats(stats_name(path, 0))
+        assert total_correct(path) == correct_trials(path) > 0
+        # The second reset of the level abandoned its first Lab episode.
+        assert record['lab_episodes'] == 1
@@ -0,0 +1,64 @@
+import csv
+import functools
+import os
+
+import pytest
+
+from gym_deepmindlab import replay
+from gym_deepmindlab.eventlog import EventLog, log_name
+from gym_deepmindlab.fake_lab import FakeLab
+from gym_deepmindlab.monitor import read_stats, stats_name
+from gym_deepmindlab.multilevel import DeepmindLabMultiLevelEnv
+from gym_deepmindlab.replay import recording_name
+
+from helpers import HEADERS, run_switches
+
+
+@pytest.mark.parametrize('report_format', ['csv', 'eventlog'])
+def test_switching_families_keeps_the_reports_apart(tmp_path, report_format):
+    run_switches(tmp_path, report_format=report_format)
+    assert sorted(os.listdir(str(tmp_path))) == ['memory', 'sound']
+    for family, header in HEADERS.items():
+        path = os.path.join(str(tmp_path), family)
+        if report_format == 'csv':
+            names = [name for name in os.listdir(path) if name.endswith('.csv')]
+            assert names
+            for name in names:
+                with open(os.path.join(path, name), newline='') as f:
+                    rows = list(csv.reader(f))
+                assert all(len(row) == len(header) for row in rows)
+                assert rows[0] == header
+        else:
+            log = EventLog(log_name(path, 0))
+            assert list(log.columns) == header[2:]
+            assert sorted(set(log.records['lab_episode'].tolist())) == [0, 1]
+
+
+def test_switching_families_keeps_the_recordings_apart(tmp_path):
+    run_switches(tmp_path, record_instr=True)
+    for family in HEADERS:
+        result = replay.replay_file(recording_name(os.path.join(str(tmp_path), family), 0))
+        assert result['family'] == family
+        assert result['counters']['correct'] > 0
+
+
+def test_switching_families_keeps_the_stats_apart(tmp_path):
+    run_switches(tmp_path, live_stats=True)
+    for family in HEADERS:
+        record, _ = read_stats(stats_name(os.path.join(str(tmp_path), family), 0))
+        assert record['family'].decode() == family
+        assert record['steps'] == 4000
+
+
+def test_schedule_counts_the_restarted_lab_episodes():
+    backend = functools.partial(FakeLab, episode_seconds=2, task_episode_seconds=1)
+    env = DeepmindLabMultiLevelEnv(['sound_task_zero', 'memory_task_zero'], backend=backend, width=4, height=4,
+                                   schedule=lambda n: 'sound_task_zero' if n < 3 else 'memory_task_zero')
+    env.reset()
+    scenes = [env.scene]
+    while len(scenes) < 5:
+        _, _, done, info = env.step(0)
+        if 'episode' in info and not done:
+            scenes.append(env.scene)
+    env.close()
+    assert scenes == ['sound_task_zero'] * 3 + ['memory_task_zero'] * 2
@@ -0,0 +1,66 @@
+import concurrent.futures
+import functools
+
+import numpy as np
+import pytest
+
+from gym_deepmindlab.fake_lab import FakeLab
+
+from helpers import SHORT_LAB, make_env
+
+
+def pixels(seed):
+    return np.random.RandomState(seed).randint(0, 256, (4, 4, 3)).astype(np.uint8)
+
+
+def test_reset_swaps_in_the_standby():
+    env = make_env('sound_task_zero', prereset=True)
+    # The frame number is in the first pixel.
+    assert env.reset()[0, 0, 0] == 1
+    for i in range(10):
+        obs, _, _, _ = env.step(i % 4)
+    assert obs[0, 0, 0] == 11
+    first = env._lab
+    assert env.reset()[0, 0, 0] == 1
+    assert env._lab is not first
+    assert env.step(0)[0][0, 0, 0] == 2
+    env.close()
+
+
+def test_prereset_stats_count_ready_and_waited_resets():
+    backend = functools.partial(SHORT_LAB, compile_seconds=0.2)
+    env = make_env('sound_task_zero', prereset=True, backend=backend)
+    # The standby is still compiling its map.
+    env.reset()
+    concurrent.futures.wait([env._standby])
+    env.reset()
+    env.close()
+    stats = env.get_prereset_stats()
+    assert stats['waited'] == 1
+    assert stats['ready'] == 1
+    assert stats['wait_time'] > 0.0
+
+
+def test_seed_reseeds_the_standby():
+    env = make_env('sound_task_zero', prereset=True)
+    env.seed(7)
+    # The standby continues with seed 8, and the Lab it replaced keeps seed 7.
+    for seed in (8, 7):
+        obs = env.reset()
+        assert (obs.ravel()[1:] == pixels(seed).ravel()[1:]).all()
+    env.close()
+
+
+def test_close_closes_the_lab_when_the_standby_failed():
+    labs = []
+
+    def backend(*args, **kwargs):
+        if labs:
+            raise RuntimeError('no second Lab')
+        labs.append(FakeLab(*args, **kwargs))
+        return labs[0]
+
+    env = make_env('sound_task_zero', prereset=True, backend=backend)
+    with pytest.raises(RuntimeError):
+        env.close()
+    assert labs[0]._closed
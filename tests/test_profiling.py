@@ -0,0 +1,72 @@
+from gym_deepmindlab.profiling import PHASES, HISTOGRAM_BUCKETS, LAB_STEP, OBSERVATIONS, INSTR_PARSE, \
+    PROCESS_COMMAND, REPORT_WRITE, RESET
+
+from helpers import make_env
+
+STEPS = 100
+
+
+def run_steps(env, steps=STEPS):
+    env.reset()
+    infos = [env.step(i % 4)[3] for i in range(steps)]
+    env.close()
+    return infos
+
+
+def test_stats_are_empty_without_instrumentation():
+    env = make_env('sound_task_zero')
+    run_steps(env)
+    assert env.get_stats() == {}
+
+
+def test_stats_count_every_phase(tmp_path):
+    env = make_env('sound_task_zero', instrument=True)
+    env.set_report_path(str(tmp_path), 0)
+    run_steps(env)
+    stats = env.get_stats()
+    assert len(stats['histogram_bounds_us']) == HISTOGRAM_BUCKETS
+    phases = stats['phases']
+    assert sorted(phases) == sorted(PHASES)
+    for phase in (LAB_STEP, OBSERVATIONS, INSTR_PARSE, PROCESS_COMMAND):
+        assert phases[phase]['count'] == STEPS
+    assert phases[RESET]['count'] == 1
+    assert phases[REPORT_WRITE]['count'] > 0
+    for phase in PHASES:
+        assert sum(phases[phase]['histogram']) == phases[phase]['count']
+        assert phases[phase]['total'] >= 0.0
+    env.reset_stats()
+    assert env.get_stats()['phases'][LAB_STEP]['count'] == 0
+
+
+def test_frame_skip_times_the_frames_as_one_lab_step():
+    env = make_env('sound_task_zero', frame_skip=4, instrument=True)
+    run_steps(env)
+    phases = env.get_stats()['phases']
+    assert phases[LAB_STEP]['count'] == STEPS
+    assert phases[OBSERVATIONS]['count'] == phases[INSTR_PARSE]['count'] == 0
+
+
+def test_stats_in_episode_info():
+    env = make_env('sound_task_zero', stats_in_episode_info=True)
+    # A task episode lasts 25 seconds.
+    infos = run_steps(env, 25 * 60)
+    episodes = [info['episode'] for info in infos if 'episode' in info]
+    assert len(episodes) == 1
+    assert sorted(episodes[0]['timings']) == sorted(PHASES)
+    assert episodes[0]['timings'][LAB_STEP] > 0.0
+
+
+def test_profiler_hooks():
+    env = make_env('sound_task_zero')
+    calls = []
+    hook = lambda phase, seconds: calls.append(phase)
+    # Removing a hook that was never added does nothing.
+    env.remove_profiler_hook(hook)
+    env.add_profiler_hook(hook)
+    env.reset()
+    env.step(0)
+    assert calls == [RESET, LAB_STEP, OBSERVATIONS, INSTR_PARSE, PROCESS_COMMAND]
+    env.remove_profiler_hook(hook)
+    env.step(0)
+    env.close()
+    assert len(calls) == 5
@@ -0,0 +1,39 @@
+import pytest
+
+from gym_deepmindlab import replay
+from gym_deepmindlab.replay import InstrRecorder, CHUNK, recording_name
+
+from helpers import run_env, read_files
+
+
+def test_replay_matches_live_counters(tmp_path, scene):
+    env = run_env(scene, tmp_path, record_instr=True)
+    result = replay.replay_file(recording_name(tmp_path, 0))
+    assert result['family'] == env.task.family
+    assert result['episode'] == env.task.episode
+    assert result['counters'] == dict(zip(env.task.columns, env.task.counters()))
+
+
+@pytest.mark.parametrize('report_format', ['csv', 'eventlog'])
+def test_replay_matches_live_reports(tmp_path, scene, report_format):
+    run_env(scene, tmp_path / 'live', report_format=report_format, record_instr=True)
+    replay.replay([recording_name(tmp_path / 'live', 0)], str(tmp_path / 'replayed'), report_format)
+    live = read_files(tmp_path / 'live')
+    del live['rat0.instr']
+    assert read_files(tmp_path / 'replayed') == live
+
+
+def test_reopening_drops_a_partial_chunk(tmp_path):
+    recorder = InstrRecorder(str(tmp_path), 0, 'memory')
+    recorder.reset()
+    recorder.instr('first')
+    recorder.close()
+    # A crash in the middle of a chunk.
+    with open(recording_name(tmp_path, 0), 'ab') as f:
+        f.write(CHUNK.pack(100) + b'\1' * 10)
+    recorder = InstrRecorder(str(tmp_path), 0, 'memory')
+    recorder.instr('second')
+    recorder.close()
+    family, records = replay.read_recording(recording_name(tmp_path, 0))
+    assert family == 'memory'
+    assert records == [(replay.RESET, b''), (replay.INSTR, b'first'), (replay.INSTR, b'second')]
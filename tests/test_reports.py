@@ -0,0 +1,86 @@
+import os
+
+from gym_deepmindlab import report
+from gym_deepmindlab.eventlog import EventLog, EventLogWriter, log_name
+
+from helpers import run_env, read_files
+
+
+def test_csv_matches_golden(tmp_path, scene, golden):
+    run_env(scene, tmp_path)
+    assert read_files(tmp_path) == golden
+
+
+def test_eventlog_export_matches_golden(tmp_path, scene, golden):
+    run_env(scene, tmp_path / 'log', report_format='eventlog')
+    report.export_csv(EventLog(log_name(tmp_path / 'log', 0)), 0, str(tmp_path / 'csv'))
+    assert read_files(tmp_path / 'csv') == golden
+
+
+def test_export_csv_round_trip(tmp_path, scene):
+    # Only the memory task has event names without a fixed code.
+    run_env(scene, tmp_path / 'log', report_format='eventlog')
+    run_env(scene, tmp_path / 'csv')
+    report.main(['export-csv', str(tmp_path / 'log'), '--out', str(tmp_path / 'exported')])
+    assert read_files(tmp_path / 'exported') == read_files(tmp_path / 'csv')
+    assert os.path.exists(os.path.join(str(tmp_path / 'log'), 'rat0.names')) == (scene == 'memory_task_zero')
+
+
+def test_summary_counts_every_lab_episode_once(tmp_path):
+    # Three Lab episodes, each with one task episode and one correct trial.
+    writer = EventLogWriter(str(tmp_path), 0, ['missed', 'correct'])
+    for lab_episode in range(3):
+        writer.write_event(0, 'Set reward arm1', 1, (0, 0))
+        writer.write_event(0, 'Picked up arm1', 4, (0, 1))
+        writer.end_lab_episode()
+    writer.close()
+    log = EventLog(log_name(tmp_path, 0))
+    table = report.episode_table(log)
+    assert table['lab_episode'].tolist() == [0, 1, 2]
+    assert table['correct'].tolist() == [1, 1, 1]
+    row, = report.summary({'0': log})
+    assert row['episodes'] == 3
+    assert row['correct'] == 3
+
+
+def test_episode_table_subtracts_the_previous_episode(tmp_path):
+    writer = EventLogWriter(str(tmp_path), 0, ['missed', 'correct'])
+    for episode in range(3):
+        writer.write_event(episode, 'Picked up arm1', 4, (episode, episode + 1))
+    writer.close()
+    # Reopening continues with a new Lab episode.
+    writer = EventLogWriter(str(tmp_path), 0, ['missed', 'correct'])
+    writer.write_event(0, 'Picked up arm1', 4, (0, 1))
+    writer.close()
+    table = report.episode_table(EventLog(log_name(tmp_path, 0)))
+    assert table[['lab_episode', 'episode']].tolist() == [(0, 0), (0, 1), (0, 2), (1, 0)]
+    assert table['missed'].tolist() == [0, 1, 1, 0]
+    assert table['correct'].tolist() == [1, 1, 1, 1]
+
+
+def test_summary_matches_the_scored_events(tmp_path, scene):
+    run_env(scene, tmp_path, report_format='eventlog')
+    log = EventLog(log_name(tmp_path, 0))
+    names = [log.names[event] for event in log.records['event'].tolist()]
+    row, = report.summary({'0': log})
+    assert row['correct'] == sum(name == 'correct_trial' or name.startswith('Picked up') for name in names)
+    # The third Lab episode ends before its first event.
+    assert sorted(set(log.records['lab_episode'].tolist())) == [0, 1]
+
+
+def test_reopening_drops_a_partial_record(tmp_path):
+    writer = EventLogWriter(str(tmp_path), 0, ['missed', 'correct'])
+    writer.write_event(0, 'Picked up arm1', 4, (0, 1))
+    writer.close()
+    # A crash in the middle of a record and of a name.
+    with open(log_name(tmp_path, 0), 'ab') as f:
+        f.write(b'\1' * 10)
+    with open(str(tmp_path / 'rat0.names'), 'a') as f:
+        f.write('Picked up ar')
+    writer = EventLogWriter(str(tmp_path), 0, ['missed', 'correct'])
+    writer.write_event(1, 'Picked up arm2', 8, (0, 2))
+    writer.close()
+    log = EventLog(log_name(tmp_path, 0))
+    assert log.records['episode'].tolist() == [0, 1]
+    assert log.records['correct'].tolist() == [1, 2]
+    assert [log.names[event] for event in log.records['event'].tolist()] == ['Picked up arm1', 'Picked up arm2']
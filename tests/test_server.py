@@ -0,0 +1,76 @@
+import os
+import socket
+import threading
+
+import pytest
+
+from gym_deepmindlab.server import EnvServer, DeepmindLabRemoteEnv, DeepmindLabRemoteVectorEnv
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    server = EnvServer(str(tmp_path / 'server.sock'), max_envs=4, env_kwargs={'backend': 'fake'})
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.socket_path
+    server.shutdown()
+    server.server_close()
+
+
+def test_remote_vector_env_spaces_describe_the_batch(socket_path):
+    env = DeepmindLabRemoteVectorEnv('sound_task_zero', num_envs=2, socket_path=socket_path, width=4, height=4)
+    try:
+        assert env.observation_space.shape == (2, 4, 4, 3)
+        assert env.single_observation_space.shape == (4, 4, 3)
+        assert env.action_space.shape == (2,)
+        assert env.observation_space.contains(env.reset())
+        observations, rewards, dones, infos = env.step(env.action_space.sample())
+        assert env.observation_space.contains(observations)
+        assert rewards.shape == dones.shape == (2,)
+    finally:
+        env.close()
+
+
+def test_remote_env_matches_local_spaces(socket_path):
+    env = DeepmindLabRemoteEnv('sound_task_zero', socket_path=socket_path, width=4, height=4)
+    try:
+        assert env.observation_space.shape == (4, 4, 3)
+        assert env.action_space.n == 4
+        obs, reward, done, info = env.step(0)
+        assert obs.shape == (4, 4, 3)
+        assert isinstance(reward, float)
+    finally:
+        env.close()
+
+
+def test_remote_report_options_reach_the_env(socket_path, tmp_path):
+    env = DeepmindLabRemoteEnv('sound_task_zero', socket_path=socket_path, width=4, height=4)
+    try:
+        env.set_report_path(str(tmp_path / 'reports'), 3, report_format='eventlog', live_stats=True)
+        env.reset()
+    finally:
+        env.close()
+    assert sorted(os.listdir(str(tmp_path / 'reports'))) == ['rat3.evlog', 'rat3.stats']
+
+
+def test_server_replaces_a_stale_socket(tmp_path):
+    path = str(tmp_path / 'server.sock')
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    server = EnvServer(path, env_kwargs={'backend': 'fake'})
+    server.server_close()
+
+
+def test_server_keeps_a_socket_in_use(socket_path):
+    with pytest.raises(Exception, match='already listening'):
+        EnvServer(socket_path, env_kwargs={'backend': 'fake'})
+    assert os.path.exists(socket_path)
+
+
+def test_server_keeps_a_file_that_is_not_a_socket(tmp_path):
+    path = tmp_path / 'server.sock'
+    path.write_text('data')
+    with pytest.raises(Exception, match='not a socket'):
+        EnvServer(str(path), env_kwargs={'backend': 'fake'})
+    assert path.read_text() == 'data'
@@ -0,0 +1,94 @@
+import concurrent.futures
+import multiprocessing
+
+import pytest
+
+from gym_deepmindlab import tasks
+from gym_deepmindlab.instr import Event, POSITION, PICKUP
+from gym_deepmindlab.tasks import TaskTable, Rule, register_task, task_family, make_task, pack_states, unpack_state
+
+from helpers import make_env
+
+
+class ListReport:
+    def __init__(self):
+        self.rows = []
+
+    def write_event(self, episode, type_event, seconds, counters):
+        self.rows.append((episode, type_event, seconds, counters))
+
+    def end_lab_episode(self):
+        pass
+
+
+def run_task(scene, steps=2000):
+    """Returns the task of scene after steps, scoring into a ListReport."""
+    env = make_env(scene)
+    env.task.report = ListReport()
+    env.reset()
+    for i in range(steps):
+        env.step(i % 4)
+    env.close()
+    return env.task
+
+
+def packed_states(scenes):
+    return pack_states([run_task(scene) for scene in scenes])
+
+
+def test_pack_unpack_round_trip(scene):
+    task = run_task(scene)
+    restored = make_task(task.family)
+    unpack_state(pack_states([task])[0], restored)
+    assert restored.state == task.state
+    assert [type(value) for value in restored.state] == [type(value) for value in task.state]
+
+
+def test_states_packed_in_another_process_decode_the_same():
+    # The other process sees the positions of the levels in another order.
+    scenes = ('memory_task_zero', 'nose_poke_zero', 'sound_task_zero')
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as executor:
+        records = executor.submit(packed_states, scenes).result()
+    for record, scene in zip(records, scenes):
+        task = run_task(scene)
+        restored = make_task(task.family)
+        unpack_state(record, restored)
+        assert restored.state == task.state
+
+
+def test_pack_rejects_a_position_longer_than_the_field():
+    task = make_task('memory')
+    task.position = 'x' * (tasks.POSITION_BYTES + 1)
+    with pytest.raises(ValueError):
+        pack_states([task])
+
+
+@pytest.fixture
+def lever_table():
+    def lever_pickup(task, s, event, time):
+        s[tasks.CORRECT] += 1
+        task.write_to_file('pressed ' + event.string1, time)
+
+    table = TaskTable('lever', ('missed', 'correct'), {
+        POSITION: Rule({None: lambda task, s, event, time: task.write_to_file(event.string1, time)}, time=int),
+        PICKUP: Rule({None: lever_pickup}, time=int),
+    })
+    register_task(table, lambda scene: 'lever' in scene)
+    yield table
+    del tasks.TABLES['lever']
+    tasks._MATCHERS.pop()
+
+
+def test_registered_task_scores_its_events(lever_table):
+    assert task_family('lever_task_zero') == 'lever'
+    task = make_task(task_family('lever_task_zero'))
+    assert task.table is lever_table
+    assert task.columns == ('missed', 'correct')
+    task.report = ListReport()
+    task.process_command([Event(POSITION, 2, 3.5, 'lever_arm', ''), Event(PICKUP, 2, 4.5, 'lever1', '')])
+    assert task.report.rows == [(2, 'lever_arm', 3, (0, 0)), (2, 'pressed lever1', 4, (0, 1))]
+    assert task.position == 'lever_arm'
+    restored = make_task('lever')
+    unpack_state(pack_states([task])[0], restored)
+    assert restored.state == task.state
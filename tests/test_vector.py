@@ -0,0 +1,20 @@
+import numpy as np
+
+from gym_deepmindlab.vector import DeepmindLabVectorEnv
+
+
+def test_spaces_describe_the_batch():
+    env = DeepmindLabVectorEnv('sound_task_zero', num_envs=2, width=4, height=4, backend='fake')
+    try:
+        assert env.observation_space.shape == (2, 4, 4, 3)
+        assert env.single_observation_space.shape == (4, 4, 3)
+        assert env.action_space.shape == (2,)
+        assert env.single_action_space.n == 4
+        observations = env.reset()
+        assert env.observation_space.contains(observations)
+        observations, rewards, dones, infos = env.step(env.action_space.sample())
+        assert env.observation_space.contains(observations)
+        assert rewards.shape == dones.shape == infos['sound_status'].shape == (2,)
+        assert np.array_equal(observations[0], observations[1])
+    finally:
+        env.close()
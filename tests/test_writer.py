@@ -0,0 +1,110 @@
+import contextlib
+import csv
+import threading
+
+import pytest
+
+from gym_deepmindlab.eventlog import EventLogWriter
+from gym_deepmindlab.replay import InstrRecorder
+from gym_deepmindlab.writer import CsvReportWriter, ReportQueueFull, _open_writers, _close_open_writers
+
+ROWS = 200
+
+
+class GatedWriter(CsvReportWriter):
+    """Holds the worker thread in its first batch until the gate is opened."""
+
+    def __init__(self, *args, **kwargs):
+        self.gate = threading.Event()
+        self.waiting = threading.Event()
+        super(GatedWriter, self).__init__(*args, **kwargs)
+
+    def _write_batch(self, batch):
+        self.waiting.set()
+        self.gate.wait()
+        super(GatedWriter, self)._write_batch(batch)
+
+
+def written_events(path):
+    with open(str(path / 'rat0_0.csv'), newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['time_stamp', 'event', 'correct']
+    return [int(row[1]) for row in rows[1:]]
+
+
+def test_block_keeps_every_row_in_order(tmp_path):
+    writer = CsvReportWriter(str(tmp_path), 0, ['correct'], queue_size=4, batch_size=3)
+    for i in range(ROWS):
+        writer.write_event(0, i, i, (i,))
+    writer.close()
+    assert written_events(tmp_path) == list(range(ROWS))
+    assert writer.dropped == 0
+
+
+def test_drop_keeps_the_order_of_the_queued_rows(tmp_path):
+    writer = GatedWriter(str(tmp_path), 0, ['correct'], queue_size=4, on_full='drop', batch_size=3)
+    for i in range(ROWS):
+        writer.write_event(0, i, i, (i,))
+    writer.gate.set()
+    writer.close()
+    events = written_events(tmp_path)
+    assert writer.dropped > 0
+    assert len(events) + writer.dropped == ROWS
+    assert events == sorted(events)
+    assert events[0] == 0
+
+
+def test_raise_keeps_the_order_of_the_queued_rows(tmp_path):
+    writer = GatedWriter(str(tmp_path), 0, ['correct'], queue_size=4, on_full='raise', batch_size=3)
+    queued = 0
+    with pytest.raises(ReportQueueFull):
+        for i in range(ROWS):
+            writer.write_event(0, i, i, (i,))
+            queued += 1
+    writer.gate.set()
+    writer.close()
+    assert written_events(tmp_path) == list(range(queued))
+
+
+@pytest.mark.parametrize('on_full', ['drop', 'raise'])
+def test_flush_without_waiting_does_not_block_on_a_full_queue(tmp_path, on_full):
+    writer = GatedWriter(str(tmp_path), 0, ['correct'], queue_size=4, on_full=on_full, batch_size=3)
+    writer.write_event(0, 0, 0, (0,))
+    writer.waiting.wait()
+    with pytest.raises(ReportQueueFull) if on_full == 'raise' else contextlib.nullcontext():
+        for i in range(1, ROWS):
+            writer.write_event(0, i, i, (i,))
+    flusher = threading.Thread(target=writer.flush, kwargs=dict(close_files=True, wait=False), daemon=True)
+    flusher.start()
+    flusher.join(5)
+    blocked = flusher.is_alive()
+    writer.gate.set()
+    writer.close()
+    assert not blocked
+    events = written_events(tmp_path)
+    assert events == sorted(events)
+
+
+def test_flush_between_episodes_keeps_the_order(tmp_path):
+    writer = CsvReportWriter(str(tmp_path), 0, ['correct'], queue_size=4, batch_size=3)
+    for i in range(ROWS):
+        writer.write_event(i // 50, i, i, (i,))
+        if i % 50 == 49:
+            writer.flush(close_files=True, wait=False)
+    writer.close()
+    for episode in range(ROWS // 50):
+        with open(str(tmp_path / ('rat0_%d.csv' % episode)), newline='') as f:
+            rows = list(csv.reader(f))[1:]
+        assert [int(row[1]) for row in rows] == list(range(episode * 50, episode * 50 + 50))
+
+
+def test_open_writers_are_closed_at_exit(tmp_path):
+    writers = [CsvReportWriter(str(tmp_path), 0, ['correct']),
+               EventLogWriter(str(tmp_path), 0, ['correct']),
+               InstrRecorder(str(tmp_path), 0, 'memory')]
+    assert all(writer in _open_writers for writer in writers)
+    writers[0].close()
+    assert writers[0] not in _open_writers
+    _close_open_writers()
+    assert not _open_writers
+    assert all(writer._closed for writer in writers)